@@ -1,8 +1,21 @@
 # In this project we're interested in the average number of comments on posts on the news website "Hacker News". This website has so-called "Ask HN" and "Show HN" posts, which are posts where the community is asked a specific question or shown something by the creator of that post. We want to find out a) if these kinds of posts receive more comments on average and b) if posts created at certain time receive more comments.
 
+# The analysis is split into four steps (load, classify, aggregate and report) that can be imported and called from other code. The loaded posts are kept in memory, so a long-running process can answer many queries without parsing the file again:
+#
+#   import Main
+#   posts = Main.load()
+#   print(*Main.report(Main.aggregate(posts, "ask")), sep="\n")
+#   print(*Main.report(Main.aggregate(posts, "show")), sep="\n")
+
 import os
 from csv import reader
-import datetime as dt
+
+import numpy as np
+
+from stream import sorted_swap, REPORT_PREFIXES
+from columnar import load_columns, titles_of, hours_of, hour_totals
+from classify import categories_of, classify_heads
+from cache import load_cached
 
 
 def get_path(path):
@@ -10,81 +23,76 @@ def get_path(path):
     return os.path.join(dir_path, path)
 
 
-opened_file = open(get_path("hacker_news.csv"))
-read_file = reader(opened_file)
-hn = list(read_file)
-
-# The first list contains the column headers. We will separate thse from the rest of the data.
-headers, hn = hn[0], hn[1:]
-
-# We will now separate the "Ask HN" and "Show HN" posts from the others.
-ask_posts = []
-show_posts = []
-other_posts = []
-for post in hn:
-    title = post[1]
-    title = title.lower()
-    if title.startswith("ask hn"):
-        ask_posts.append(post)
-    if title.startswith("show hn"):
-        show_posts.append(post)
+# The posts are loaded as NumPy columns. By default they come from the columnar cache (see cache.py), which is built on the first load and memory-mapped afterwards.
+def load(path=None, use_cache=True):
+    path = path or get_path("hacker_news.csv")
+    if use_cache:
+        columns, _ = load_cached(path)
     else:
-        other_posts.append(post)
-
-# print(len(ask_posts))
-# print(len(show_posts))
-# print(len(other_posts))
-
-# Let us calculate the average number of comments for "Ask HN" and "Show HN" posts.
-total_ask_comments = 0
-total_show_comments = 0
-
-for post in ask_posts:
-    ask_comments = post[4]
-    total_ask_comments += int(ask_comments)
-
-for post in show_posts:
-    show_comments = post[4]
-    total_show_comments += int(show_comments)
+        with open(path, newline="", encoding="utf-8") as f:
+            columns = load_columns(reader(f))
+    return {"path": path, "columns": columns, "classified": {}}
+
+
+# We will now separate the "Ask HN" and "Show HN" posts from the others. The result is stored with the posts, so it is only computed once per set of prefixes.
+def classify(posts, prefixes=REPORT_PREFIXES):
+    key = tuple(prefixes.items())
+    if key not in posts["classified"]:
+        # Cached titles are cut to a fixed width; it has to hold the longest prefix.
+        width = max((len(prefix.encode("utf-8")) for prefix in prefixes), default=1)
+        codes = classify_heads(titles_of(posts["columns"], width), prefixes)
+        posts["classified"][key] = (categories_of(prefixes), codes)
+    return posts["classified"][key]
+
+
+# Let us calculate the number of posts and comments per category, and the number of posts and comments per hour for the posts of the given category.
+def aggregate(posts, category="ask", prefixes=REPORT_PREFIXES):
+    categories, codes = classify(posts, prefixes)
+    num_comments = np.asarray(posts["columns"]["num_comments"])
+
+    posts_by_category = np.bincount(codes, minlength=len(categories))
+    comments_by_category = np.bincount(
+        codes, weights=num_comments, minlength=len(categories)
+    )
+
+    mask = codes == categories.index(category)
+    counts, sums = hour_totals(hours_of(posts["columns"], mask), num_comments[mask])
+    hours = np.flatnonzero(counts)
+
+    return {
+        "category": category,
+        "posts_by_category": dict(zip(categories, posts_by_category.tolist())),
+        "comments_by_category": {
+            c: int(total) for c, total in zip(categories, comments_by_category)
+        },
+        "counts_by_hour": {"{:02d}".format(h): int(counts[h]) for h in hours},
+        "comments_by_hour": {"{:02d}".format(h): int(sums[h]) for h in hours},
+    }
 
-avg_ask_comments = total_ask_comments / len(ask_posts)
-avg_show_comments = total_show_comments / len(show_posts)
 
 # "Ask HN" posts get 14 comments per post on average versus. 10 comments for "Show HN" posts. For that reason the focus of our second question will be on "Ask HN" posts.
-# print(avg_ask_comments, avg_show_comments)
-
-result_list = []
-for post in ask_posts:
-    created_at = post[6]
-    ask_comments = int(post[4])
-    result_list.append([created_at, ask_comments])
-
-counts_by_hour = {}
-comments_by_hour = {}
-for row in result_list:
-    date = dt.datetime.strptime(row[0], "%m/%d/%Y %H:%M")
-    hour = date.strftime("%H")
-    if hour not in counts_by_hour:
-        counts_by_hour[hour] = 1
-        comments_by_hour[hour] = row[1]
-    else:
-        counts_by_hour[hour] += 1
-        comments_by_hour[hour] += row[1]
-
-# print(counts_by_hour, comments_by_hour)
-
-avg_by_hour = []
-for hour in comments_by_hour:
-    avg_by_hour.append([hour, (comments_by_hour[hour] / counts_by_hour[hour])])
-
-swap_avg_by_hour = []
-for val in avg_by_hour:
-    temp_list = [val[1], val[0]]
-    swap_avg_by_hour.append(temp_list)
-
-sorted_swap = sorted(swap_avg_by_hour, reverse=True)
-# print(*sorted_swap, sep="\n")
-
-print("Top 5 Hours for Ask Posts Comments (Timezone: EST)")
-for val in sorted_swap[:5]:
-    print("{h}:00 {avg:.2f} average comments per post".format(h=val[1], avg=val[0]))
+def average_comments(aggregated):
+    return {
+        c: aggregated["comments_by_category"][c] / n
+        for c, n in aggregated["posts_by_category"].items()
+        if n
+    }
+
+
+def report(aggregated, top=5):
+    lines = [
+        "Top {n} Hours for {c} Posts Comments (Timezone: EST)".format(
+            n=top, c=aggregated["category"].capitalize()
+        )
+    ]
+    for val in sorted_swap(aggregated)[:top]:
+        lines.append(
+            "{h}:00 {avg:.2f} average comments per post".format(h=val[1], avg=val[0])
+        )
+    return lines
+
+
+if __name__ == "__main__":
+    posts = load()
+    # print(average_comments(aggregate(posts)))
+    print(*report(aggregate(posts, "ask")), sep="\n")
@@ -0,0 +1,296 @@
+# Benchmark harness for the Hacker News analysis. Every engine runs the four stages of Main.py separately: load the
+# posts, classify them, aggregate the comments by hour and build the report lines. The stages are timed one by one and
+# every engine runs in a fresh process, so its peak RSS is not inflated by the engines before it.
+#
+# Engines:
+# - loop:     the lists and loops of the original Main.py script
+# - pipeline: the load, classify, aggregate and report steps of Main.py, reading the CSV
+# - columnar: NumPy columns parsed from the CSV (columnar.py)
+# - cache:    NumPy columns memory-mapped from the columnar cache (cache.py), built before the engines run
+#
+# Every run is appended as one JSON line to the output file, together with the commit and library versions, so results
+# of different versions can be compared.
+#
+# Usage:
+#   python bench.py [path/to/dump.csv] [--generate ROWS] [--engine loop ...] [--output bench_results.jsonl]
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import resource
+import subprocess
+import datetime as dt
+import multiprocessing
+from csv import reader
+
+import numpy as np
+
+from stream import get_path, sorted_swap
+
+ENGINES = ["loop", "pipeline", "columnar", "cache"]
+
+
+def report_lines(sorted_swap, top=5):
+    lines = ["Top {n} Hours for Ask Posts Comments (Timezone: EST)".format(n=top)]
+    for val in sorted_swap[:top]:
+        lines.append(
+            "{h}:00 {avg:.2f} average comments per post".format(h=val[1], avg=val[0])
+        )
+    return lines
+
+
+# The loops as they were, including the second "if" that also puts "Ask HN" posts into other_posts and the averages
+# that the report does not use, so the baseline costs what the original script cost.
+def loop_stages(path):
+    def load():
+        with open(path, newline="", encoding="utf-8") as f:
+            hn = list(reader(f))
+        return hn[1:]
+
+    def classify(hn):
+        ask_posts = []
+        show_posts = []
+        other_posts = []
+        for post in hn:
+            title = post[1]
+            title = title.lower()
+            if title.startswith("ask hn"):
+                ask_posts.append(post)
+            if title.startswith("show hn"):
+                show_posts.append(post)
+            else:
+                other_posts.append(post)
+        return ask_posts, show_posts
+
+    def aggregate(posts):
+        ask_posts, show_posts = posts
+        total_ask_comments = 0
+        total_show_comments = 0
+
+        for post in ask_posts:
+            ask_comments = post[4]
+            total_ask_comments += int(ask_comments)
+
+        for post in show_posts:
+            show_comments = post[4]
+            total_show_comments += int(show_comments)
+
+        avg_ask_comments = total_ask_comments / len(ask_posts)
+        avg_show_comments = total_show_comments / len(show_posts)
+
+        result_list = []
+        for post in ask_posts:
+            created_at = post[6]
+            ask_comments = int(post[4])
+            result_list.append([created_at, ask_comments])
+
+        counts_by_hour = {}
+        comments_by_hour = {}
+        for row in result_list:
+            date = dt.datetime.strptime(row[0], "%m/%d/%Y %H:%M")
+            hour = date.strftime("%H")
+            if hour not in counts_by_hour:
+                counts_by_hour[hour] = 1
+                comments_by_hour[hour] = row[1]
+            else:
+                counts_by_hour[hour] += 1
+                comments_by_hour[hour] += row[1]
+
+        avg_by_hour = []
+        for hour in comments_by_hour:
+            avg_by_hour.append([hour, (comments_by_hour[hour] / counts_by_hour[hour])])
+
+        swap_avg_by_hour = []
+        for val in avg_by_hour:
+            temp_list = [val[1], val[0]]
+            swap_avg_by_hour.append(temp_list)
+
+        return sorted(swap_avg_by_hour, reverse=True)
+
+    return [("load", load), ("classify", classify), ("aggregate", aggregate)]
+
+
+def columnar_stages(load):
+    from columnar import titles_of, classify_columns, columnar_state
+
+    def classify(columns):
+        classify_columns(titles_of(columns))
+        return columns
+
+    def aggregate(columns):
+        return sorted_swap(columnar_state(columns))
+
+    return [("load", load), ("classify", classify), ("aggregate", aggregate)]
+
+
+def pipeline_stages(path):
+    import Main
+
+    def classify(posts):
+        Main.classify(posts)
+        return posts
+
+    def aggregate(posts):
+        return sorted_swap(Main.aggregate(posts))
+
+    return [
+        ("load", lambda: Main.load(path, use_cache=False)),
+        ("classify", classify),
+        ("aggregate", aggregate),
+    ]
+
+
+def engine_stages(engine, path):
+    if engine == "loop":
+        return loop_stages(path)
+    if engine == "pipeline":
+        return pipeline_stages(path)
+    if engine == "columnar":
+        from columnar import load_columns
+
+        def load():
+            with open(path, newline="", encoding="utf-8") as f:
+                return load_columns(reader(f))
+
+        return columnar_stages(load)
+    if engine == "cache":
+        from cache import load_cached
+
+        return columnar_stages(lambda: load_cached(path)[0])
+    raise ValueError("Unknown engine: {}".format(engine))
+
+
+# Peak RSS in kilobytes. On Linux ru_maxrss survives fork and exec, so a child would report the peak of its parent;
+# VmHWM in /proc is reset for the new process and is used when available.
+def peak_rss_kb():
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# Runs in a child process.
+def run_engine(engine, path):
+    start_rss = peak_rss_kb()
+    stages = engine_stages(engine, path)
+    timings = {}
+
+    value = None
+    for name, func in stages:
+        start = time.perf_counter()
+        value = func() if value is None else func(value)
+        timings[name] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lines = report_lines(value)
+    timings["report"] = time.perf_counter() - start
+
+    return {
+        "engine": engine,
+        "stages": timings,
+        "total": sum(timings.values()),
+        "start_rss_kb": start_rss,
+        "peak_rss_kb": peak_rss_kb(),
+        "report": lines,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.realpath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(path, engines):
+    if "cache" in engines:
+        from cache import load_cached
+
+        load_cached(path)
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for engine in engines:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_engine, (engine, path)))
+
+    reports = {tuple(result.pop("report")) for result in results}
+    return {
+        "timestamp": dt.datetime.now(dt.timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "path": os.path.abspath(path),
+        "file_size": os.path.getsize(path),
+        "reports_match": len(reports) == 1,
+        "results": results,
+    }
+
+
+def print_run(run):
+    print(
+        "{p} ({s:.1f} MB), commit {c}".format(
+            p=run["path"], s=run["file_size"] / 1e6, c=run["commit"]
+        )
+    )
+    print(
+        "{:>10} {:>9} {:>9} {:>9} {:>9} {:>9} {:>12}".format(
+            "engine", "load", "classify", "aggregate", "report", "total", "peak RSS MB"
+        )
+    )
+    for result in run["results"]:
+        stages = result["stages"]
+        print(
+            "{:>10} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f} {:>12.1f}".format(
+                result["engine"],
+                stages["load"],
+                stages["classify"],
+                stages["aggregate"],
+                stages["report"],
+                result["total"],
+                result["peak_rss_kb"] / 1024,
+            )
+        )
+    if not run["reports_match"]:
+        print("WARNING: the engines do not produce the same report")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Hacker News analysis")
+    parser.add_argument("path", nargs="?", default=get_path("hacker_news.csv"))
+    parser.add_argument(
+        "--generate", type=int, default=None, help="benchmark a synthetic file"
+    )
+    parser.add_argument("--engine", action="append", choices=ENGINES)
+    parser.add_argument("--output", default="bench_results.jsonl")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.path
+        if args.generate is not None:
+            from generate import generate
+
+            path = os.path.join(tmp_dir, "hacker_news_{}.csv".format(args.generate))
+            generate(path, args.generate)
+
+        run = run_benchmark(path, args.engine or ENGINES)
+        run["generated_rows"] = args.generate
+
+    with open(args.output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run) + "\n")
+    print_run(run)
+    sys.exit(0 if run["reports_match"] else 1)
@@ -0,0 +1,77 @@
+# Benchmark of the hour-of-day bucketing: the strptime loop of the original Main.py versus parse_hours and bincount from
+# columnar.py. The rows are made by repeating the "Ask HN" posts from hacker_news.csv until the wanted size is reached.
+#
+# Usage:
+#   python bench_hours.py [size ...]      (default sizes: 20000 1000000 10000000)
+
+import sys
+import time
+from csv import reader
+import datetime as dt
+
+import numpy as np
+
+from stream import get_path
+from columnar import load_columns, classify_columns, parse_hours, hour_totals
+
+
+def loop_by_hour(created_at, num_comments):
+    counts_by_hour = {}
+    comments_by_hour = {}
+    for created, comments in zip(created_at, num_comments):
+        date = dt.datetime.strptime(created, "%m/%d/%Y %H:%M")
+        hour = date.strftime("%H")
+        if hour not in counts_by_hour:
+            counts_by_hour[hour] = 1
+            comments_by_hour[hour] = comments
+        else:
+            counts_by_hour[hour] += 1
+            comments_by_hour[hour] += comments
+    return counts_by_hour, comments_by_hour
+
+
+def bincount_by_hour(created_at, num_comments):
+    counts, sums = hour_totals(parse_hours(created_at), num_comments)
+    hours = np.flatnonzero(counts)
+    counts_by_hour = {"{:02d}".format(h): int(counts[h]) for h in hours}
+    comments_by_hour = {"{:02d}".format(h): int(sums[h]) for h in hours}
+    return counts_by_hour, comments_by_hour
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or [20000, 1000000, 10000000]
+
+    with open(get_path("hacker_news.csv"), newline="", encoding="utf-8") as f:
+        columns = load_columns(reader(f))
+    is_ask, _ = classify_columns(columns["title"])
+    sample_created = columns["created_at"][is_ask]
+    sample_comments = columns["num_comments"][is_ask]
+
+    print(
+        "{:>10} {:>12} {:>12} {:>9}".format(
+            "rows", "loop (s)", "bincount (s)", "speedup"
+        )
+    )
+    for size in sizes:
+        reps = -(-size // len(sample_created))
+        created_at = np.tile(sample_created, reps)[:size]
+        num_comments = np.tile(sample_comments, reps)[:size]
+
+        # The loop gets plain Python lists, as it did in Main.py.
+        loop_time, loop_result = timed(
+            loop_by_hour, created_at.tolist(), num_comments.tolist()
+        )
+        vec_time, vec_result = timed(bincount_by_hour, created_at, num_comments)
+        assert loop_result == vec_result
+
+        print(
+            "{:>10} {:>12.3f} {:>12.3f} {:>8.1f}x".format(
+                size, loop_time, vec_time, loop_time / vec_time
+            )
+        )
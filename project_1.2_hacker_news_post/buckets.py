@@ -0,0 +1,165 @@
+# Time bucketing of Hacker News engagement. Main.py only looks at the hour of day in the naive timestamps of the data
+# set (New York time). Here the timestamps are converted to a configurable time zone and the average number of
+# comments and points is computed per hour, weekday, hour x weekday, week and month, all from the same columns.
+#
+# Converting every timestamp with zoneinfo would be far too slow, so the UTC offsets are looked up in tables with one
+# entry per hour between the first and the last post. The tables only depend on the time span of the data, not on the
+# number of posts.
+#
+# Usage:
+#   python buckets.py [path/to/dump.csv] [--tz Europe/Amsterdam] [--category ask] [--granularity hour ...]
+
+import argparse
+import datetime as dt
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+SOURCE_TZ = "America/New_York"
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+GRANULARITIES = ["hour", "weekday", "hour_weekday", "week", "month"]
+EPOCH = dt.datetime(1970, 1, 1)
+
+
+# Offsets (in minutes) to add to UTC to get the local time, for every UTC hour from first_hour to last_hour.
+def utc_offset_table(zone, first_hour, last_hour):
+    offsets = []
+    for hour in range(first_hour, last_hour + 1):
+        moment = dt.datetime.fromtimestamp(hour * 3600, dt.timezone.utc).astimezone(
+            zone
+        )
+        offsets.append(moment.utcoffset() // dt.timedelta(minutes=1))
+    return np.array(offsets, dtype=np.int64)
+
+
+# Offsets (in minutes) to subtract from the local time to get UTC, for every local hour from first_hour to last_hour.
+# For the ambiguous hour at the end of daylight saving time the first of the two moments is used.
+def local_offset_table(zone, first_hour, last_hour):
+    offsets = []
+    for hour in range(first_hour, last_hour + 1):
+        moment = (EPOCH + dt.timedelta(hours=hour)).replace(tzinfo=zone)
+        offsets.append(moment.utcoffset() // dt.timedelta(minutes=1))
+    return np.array(offsets, dtype=np.int64)
+
+
+def lookup_offsets(table_func, zone, minutes):
+    hours = minutes // 60
+    first_hour = int(hours.min())
+    table = table_func(zone, first_hour, int(hours.max()))
+    return table[hours - first_hour]
+
+
+# Converts naive minutes since 1970-01-01 in the source time zone to naive minutes in the target time zone.
+def convert_minutes(minutes, target_tz, source_tz=SOURCE_TZ):
+    minutes = np.asarray(minutes, dtype=np.int64)
+    if minutes.size == 0 or target_tz == source_tz:
+        return minutes
+    utc = minutes - lookup_offsets(local_offset_table, ZoneInfo(source_tz), minutes)
+    return utc + lookup_offsets(utc_offset_table, ZoneInfo(target_tz), utc)
+
+
+# Every granularity maps the local minutes to an integer key and the keys to a label.
+def bucket_keys(local_minutes, granularity):
+    days = local_minutes // 1440
+    hours = local_minutes // 60 % 24
+    # 1970-01-01 was a Thursday, so Monday is weekday 0 after shifting the day number by 3.
+    weekdays = (days + 3) % 7
+
+    if granularity == "hour":
+        return hours, lambda key: "{:02d}:00".format(key)
+    if granularity == "weekday":
+        return weekdays, lambda key: WEEKDAYS[key]
+    if granularity == "hour_weekday":
+        return weekdays * 24 + hours, lambda key: "{} {:02d}:00".format(
+            WEEKDAYS[key // 24], key % 24
+        )
+    if granularity == "week":
+        return days - weekdays, lambda key: str(np.datetime64(int(key), "D"))
+    if granularity == "month":
+        months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        return months, lambda key: str(np.datetime64(int(key), "M"))
+    raise ValueError("Unknown granularity: {}".format(granularity))
+
+
+# Returns, for every granularity, a list of [label, posts, average comments, average points] sorted by key.
+def bucket_stats(
+    columns,
+    mask=None,
+    target_tz=SOURCE_TZ,
+    granularities=GRANULARITIES,
+    source_tz=SOURCE_TZ,
+):
+    minutes = np.asarray(columns["created_minutes"])
+    num_comments = np.asarray(columns["num_comments"])
+    num_points = np.asarray(columns["num_points"])
+    if mask is not None:
+        minutes, num_comments, num_points = (
+            minutes[mask],
+            num_comments[mask],
+            num_points[mask],
+        )
+
+    local_minutes = convert_minutes(minutes, target_tz, source_tz)
+    results = {}
+    for granularity in granularities:
+        keys, label = bucket_keys(local_minutes, granularity)
+        if keys.size == 0:
+            results[granularity] = []
+            continue
+        first = int(keys.min())
+        keys = keys - first
+        counts = np.bincount(keys)
+        comments = np.bincount(keys, weights=num_comments)
+        points = np.bincount(keys, weights=num_points)
+        results[granularity] = [
+            [
+                label(key + first),
+                int(counts[key]),
+                comments[key] / counts[key],
+                points[key] / counts[key],
+            ]
+            for key in np.flatnonzero(counts)
+        ]
+    return results
+
+
+if __name__ == "__main__":
+    from stream import get_path
+    from cache import load_cached
+    from columnar import title_heads
+    from classify import DEFAULT_PREFIXES, categories_of, classify_heads
+
+    parser = argparse.ArgumentParser(
+        description="Hacker News engagement per time bucket"
+    )
+    parser.add_argument("path", nargs="?", default=get_path("hacker_news.csv"))
+    parser.add_argument("--tz", default=SOURCE_TZ, help="time zone to report in")
+    parser.add_argument(
+        "--category", default=None, choices=categories_of(DEFAULT_PREFIXES)
+    )
+    parser.add_argument("--granularity", action="append", choices=GRANULARITIES)
+    args = parser.parse_args()
+
+    columns, _ = load_cached(args.path)
+    mask = None
+    if args.category is not None:
+        codes = classify_heads(
+            title_heads(columns["title_offsets"], columns["title_bytes"]),
+            DEFAULT_PREFIXES,
+        )
+        mask = codes == categories_of(DEFAULT_PREFIXES).index(args.category)
+
+    results = bucket_stats(columns, mask, args.tz, args.granularity or GRANULARITIES)
+    for granularity, rows in results.items():
+        print(
+            "Average comments and points per {g} (Timezone: {tz})".format(
+                g=granularity, tz=args.tz
+            )
+        )
+        for label, posts, comments, points in rows:
+            print(
+                "{l:>12} {n:>8} posts {c:>7.2f} comments {p:>7.2f} points".format(
+                    l=label, n=posts, c=comments, p=points
+                )
+            )
+        print()
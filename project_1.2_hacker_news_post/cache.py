@@ -0,0 +1,188 @@
+# Binary columnar cache of a Hacker News dump. The first load parses the CSV and writes every column to its own file
+# in a cache directory next to the dump: id, num_points and num_comments as int64 arrays, created_at as minutes since
+# 1970-01-01 and the titles as one UTF-8 buffer plus an array of offsets into it. Later loads memory-map these files,
+# so no CSV parsing is needed at all.
+#
+# The cache stores the size, mtime and SHA-256 hash of the dump it was built from. If the size or mtime differ, the
+# hash is computed again: a dump that was only touched or copied keeps its cache, any other change rebuilds it.
+#
+# Usage:
+#   python cache.py [path/to/dump.csv] [--rebuild]
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+from csv import reader
+from itertools import islice
+
+import numpy as np
+
+from stream import get_path, print_report
+from columnar import parse_minutes, columnar_state
+
+CACHE_VERSION = 1
+CHUNK_ROWS = 1000000
+INT_COLUMNS = ["id", "num_points", "num_comments"]
+COLUMN_DTYPES = {
+    "id": np.int64,
+    "num_points": np.int64,
+    "num_comments": np.int64,
+    "created_minutes": np.int64,
+    "title_offsets": np.int64,
+    "title_bytes": np.uint8,
+}
+
+
+def cache_dir(path):
+    return path + ".cache"
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 24), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_info(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def read_meta(directory):
+    meta_path = os.path.join(directory, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_meta(directory, meta):
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def cache_is_valid(path, directory, meta):
+    if meta is None or meta["version"] != CACHE_VERSION:
+        return False
+    info = source_info(path)
+    if info["size"] == meta["size"] and info["mtime"] == meta["mtime"]:
+        return True
+    if info["size"] != meta["size"] or file_hash(path) != meta["hash"]:
+        return False
+    meta.update(info)
+    write_meta(directory, meta)
+    return True
+
+
+# The CSV is converted a million rows at a time and every chunk is appended to the column files, so building the cache
+# needs about as much memory as one chunk.
+def build_cache(path, directory):
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+
+    files = {
+        name: open(os.path.join(directory, name + ".bin"), "wb")
+        for name in COLUMN_DTYPES
+    }
+    rows_written = 0
+    title_size = 0
+    files["title_offsets"].write(np.zeros(1, dtype=np.int64).tobytes())
+
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = reader(f)
+            headers = next(rows)
+            cols = {
+                name: headers.index(name)
+                for name in INT_COLUMNS + ["title", "created_at"]
+            }
+
+            while True:
+                chunk = list(islice(rows, CHUNK_ROWS))
+                if not chunk:
+                    break
+                for name in INT_COLUMNS:
+                    values = np.array(
+                        [row[cols[name]] for row in chunk], dtype=np.int64
+                    )
+                    files[name].write(values.tobytes())
+                created_at = [row[cols["created_at"]] for row in chunk]
+                files["created_minutes"].write(parse_minutes(created_at).tobytes())
+
+                titles = [row[cols["title"]].encode("utf-8") for row in chunk]
+                lengths = np.array([len(title) for title in titles], dtype=np.int64)
+                files["title_offsets"].write(
+                    (title_size + np.cumsum(lengths)).tobytes()
+                )
+                files["title_bytes"].write(b"".join(titles))
+                title_size += int(lengths.sum())
+                rows_written += len(chunk)
+    finally:
+        for file in files.values():
+            file.close()
+
+    meta = {
+        "version": CACHE_VERSION,
+        "rows": rows_written,
+        "title_size": title_size,
+        "hash": file_hash(path),
+    }
+    meta.update(source_info(path))
+    write_meta(directory, meta)
+    return meta
+
+
+def open_cache(directory, meta):
+    lengths = {name: meta["rows"] for name in COLUMN_DTYPES}
+    lengths["title_offsets"] = meta["rows"] + 1
+    lengths["title_bytes"] = meta["title_size"]
+
+    columns = {}
+    for name, dtype in COLUMN_DTYPES.items():
+        if lengths[name] == 0:
+            columns[name] = np.zeros(0, dtype=dtype)
+        else:
+            file_path = os.path.join(directory, name + ".bin")
+            columns[name] = np.memmap(
+                file_path, dtype=dtype, mode="r", shape=(lengths[name],)
+            )
+    return columns
+
+
+# Returns the columns and whether the cache had to be (re)built.
+def load_cached(path, rebuild=False):
+    directory = cache_dir(path)
+    meta = None if rebuild else read_meta(directory)
+    if cache_is_valid(path, directory, meta):
+        return open_cache(directory, meta), False
+    meta = build_cache(path, directory)
+    return open_cache(directory, meta), True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Hacker News comment analysis from a columnar cache"
+    )
+    parser.add_argument("path", nargs="?", default=get_path("hacker_news.csv"))
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="build the cache even if it is up to date",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    columns, built = load_cached(args.path, rebuild=args.rebuild)
+    load_time = time.perf_counter() - start
+    print(
+        "Loaded {n} posts in {t:.3f} s ({kind} load)".format(
+            n=len(columns["id"]), t=load_time, kind="cold" if built else "warm"
+        )
+    )
+    print_report(columnar_state(columns))
@@ -0,0 +1,150 @@
+# Title-prefix classifier for Hacker News posts. Every post gets exactly one category: the category of the longest
+# prefix its (lower-cased) title starts with, or "other" if there is none.
+#
+# There are two ways to classify:
+# - classify_title walks a trie of the prefixes for a single title, for streaming one post at a time.
+# - classify_heads classifies a whole array of titles at once. The prefixes are grouped by length and for every length
+#   the first bytes of all titles are looked up in the sorted prefixes of that length with searchsorted. The cost
+#   therefore grows with the number of different prefix lengths and only logarithmically with the number of prefixes.
+#
+# Usage:
+#   python classify.py [path/to/dump.csv] [--prefix PREFIX=CATEGORY ...]
+
+import argparse
+
+import numpy as np
+
+DEFAULT_PREFIXES = {
+    "ask hn": "ask",
+    "show hn": "show",
+    "launch hn": "launch",
+    "tell hn": "tell",
+}
+
+OTHER = "other"
+
+
+# The categories are numbered in the order of the prefixes, "other" always gets code 0.
+def categories_of(prefixes):
+    categories = [OTHER]
+    for category in prefixes.values():
+        if category not in categories:
+            categories.append(category)
+    return categories
+
+
+def build_trie(prefixes):
+    trie = {}
+    for prefix, category in prefixes.items():
+        node = trie
+        for char in prefix.lower():
+            node = node.setdefault(char, {})
+        node[None] = category
+    return trie
+
+
+def classify_title(trie, title):
+    category = OTHER
+    node = trie
+    for char in title.lower():
+        node = node.get(char)
+        if node is None:
+            break
+        category = node.get(None, category)
+    return category
+
+
+# Turns an array of titles (str or UTF-8 bytes) into a matrix with the first `width` bytes of every title.
+def head_matrix(titles, width):
+    titles = np.asarray(titles)
+    if titles.dtype.kind == "U":
+        titles = np.char.encode(titles, "utf-8")
+    itemsize = titles.dtype.itemsize
+    if itemsize == 0:
+        return np.zeros((len(titles), width), dtype=np.uint8)
+    matrix = (
+        np.ascontiguousarray(titles).view(np.uint8).reshape(-1, itemsize)[:, :width]
+    )
+    if matrix.shape[1] < width:
+        matrix = np.pad(matrix, ((0, 0), (0, width - matrix.shape[1])))
+    return matrix
+
+
+def lower_ascii(matrix):
+    upper = (matrix >= ord("A")) & (matrix <= ord("Z"))
+    return np.where(upper, matrix + (ord("a") - ord("A")), matrix).astype(np.uint8)
+
+
+# Returns an array with the category code of every title, see categories_of for the codes.
+def classify_heads(titles, prefixes):
+    categories = categories_of(prefixes)
+    encoded = {
+        prefix.lower().encode("utf-8"): categories.index(c)
+        for prefix, c in prefixes.items()
+    }
+    width = max((len(prefix) for prefix in encoded), default=0)
+
+    codes = np.zeros(len(titles), dtype=np.int16)
+    if width == 0:
+        return codes
+    heads = lower_ascii(head_matrix(titles, width))
+
+    # Shorter prefixes are handled first, so a longer matching prefix overwrites the category of a shorter one.
+    for length in sorted({len(prefix) for prefix in encoded}):
+        keys = sorted(prefix for prefix in encoded if len(prefix) == length)
+        key_array = np.array(keys, dtype="S{}".format(length))
+        key_codes = np.array([encoded[key] for key in keys], dtype=np.int16)
+
+        title_keys = (
+            np.ascontiguousarray(heads[:, :length]).view("S{}".format(length)).ravel()
+        )
+        found = np.minimum(np.searchsorted(key_array, title_keys), len(keys) - 1)
+        matches = key_array[found] == title_keys
+        codes[matches] = key_codes[found[matches]]
+
+    return codes
+
+
+def parse_prefix(text):
+    prefix, _, category = text.partition("=")
+    return prefix.lower(), category or prefix.lower().replace(" ", "_")
+
+
+if __name__ == "__main__":
+    from stream import get_path
+    from cache import load_cached
+    from columnar import title_heads
+
+    parser = argparse.ArgumentParser(
+        description="Classify Hacker News posts by title prefix"
+    )
+    parser.add_argument("path", nargs="?", default=get_path("hacker_news.csv"))
+    parser.add_argument(
+        "--prefix",
+        action="append",
+        type=parse_prefix,
+        help="extra prefix, e.g. 'ask hn=ask'",
+    )
+    args = parser.parse_args()
+
+    prefixes = dict(DEFAULT_PREFIXES)
+    prefixes.update(args.prefix or [])
+    categories = categories_of(prefixes)
+
+    columns, _ = load_cached(args.path)
+    width = max(len(prefix.encode("utf-8")) for prefix in prefixes)
+    codes = classify_heads(
+        title_heads(columns["title_offsets"], columns["title_bytes"], width), prefixes
+    )
+
+    counts = np.bincount(codes, minlength=len(categories))
+    comments = np.bincount(
+        codes, weights=columns["num_comments"], minlength=len(categories)
+    )
+    for code, category in enumerate(categories):
+        if counts[code]:
+            print(
+                "{c}: {n} posts, {avg:.2f} average comments per post".format(
+                    c=category, n=counts[code], avg=comments[code] / counts[code]
+                )
+            )
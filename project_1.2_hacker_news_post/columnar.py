@@ -0,0 +1,162 @@
+# Columnar version of the analysis in Main.py. The original loop called strptime and strftime for every "Ask HN" post,
+# which dominated the runtime on large dumps. Here the columns are stored as NumPy arrays, the hour is read from the
+# timestamp characters for all posts at once and the per-hour counts and sums are computed with bincount.
+#
+# The result is returned in the same state format as stream.py, so the report is printed by the same code and matches
+# the output of Main.py exactly.
+#
+# Usage:
+#   python columnar.py [path/to/dump.csv | -]
+
+import sys
+from csv import reader
+
+import numpy as np
+
+from stream import get_path, open_source, new_state, print_report, REPORT_PREFIXES
+from classify import categories_of, classify_heads
+
+
+def load_columns(rows):
+    rows = iter(rows)
+    headers = next(rows)
+    title_col = headers.index("title")
+    comments_col = headers.index("num_comments")
+    created_col = headers.index("created_at")
+
+    titles = []
+    num_comments = []
+    created_at = []
+    for row in rows:
+        titles.append(row[title_col])
+        num_comments.append(row[comments_col])
+        created_at.append(row[created_col])
+
+    return {
+        "title": np.array(titles, dtype=str),
+        "num_comments": np.array(num_comments, dtype=np.int64),
+        "created_at": np.array(created_at, dtype=str),
+    }
+
+
+# The timestamps look like "8/4/2016 11:52" or "1/26/2016 9:30", so the hour is either one or two digits in front of
+# the colon. Viewing the string array as a matrix of code points lets us find the colon and read the digits in front
+# of it for every row at once.
+def parse_hours(created_at):
+    created_at = np.asarray(created_at, dtype=str)
+    if created_at.size == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    width = created_at.dtype.itemsize // 4
+    chars = created_at.view(np.uint32).reshape(-1, width)
+    rows = np.arange(len(chars))
+
+    colon = np.argmax(chars == ord(":"), axis=1)
+    ones = chars[rows, colon - 1].astype(np.int64) - ord("0")
+    tens = chars[rows, colon - 2].astype(np.int64)
+    tens = np.where(tens == ord(" "), 0, tens - ord("0"))
+    return tens * 10 + ones
+
+
+# Converts the timestamps to minutes since 1970-01-01 (in the naive EST time of the data set). The numbers in the
+# string are read column by column: a digit extends the current field and any other character moves on to the next
+# field, which gives the month, day, year, hour and minute of every row.
+def parse_minutes(created_at):
+    created_at = np.asarray(created_at, dtype=str)
+    if created_at.size == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    width = created_at.dtype.itemsize // 4
+    chars = created_at.view(np.uint32).reshape(-1, width)
+    rows = np.arange(len(chars))
+    fields = np.zeros((6, len(chars)), dtype=np.int64)
+    field = np.zeros(len(chars), dtype=np.int64)
+
+    for j in range(width):
+        char = chars[:, j].astype(np.int64)
+        is_digit = (char >= ord("0")) & (char <= ord("9"))
+        fields[field, rows] = np.where(
+            is_digit, fields[field, rows] * 10 + char - ord("0"), fields[field, rows]
+        )
+        field = np.minimum(field + (~is_digit & (char != 0)), 5)
+
+    month, day, year, hour, minute = fields[:5]
+    months = (year - 1970) * 12 + month - 1
+    days = (
+        months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+        + day
+        - 1
+    )
+    return (days * 24 + hour) * 60 + minute
+
+
+# Returns the first bytes of every title in a title buffer (see cache.py) as a fixed-width bytes array, which is
+# enough to check the title prefixes without decoding the titles.
+def title_heads(offsets, data, width=16):
+    starts = offsets[:-1]
+    lengths = offsets[1:] - starts
+    positions = starts[:, None] + np.arange(width)
+    heads = np.zeros((len(starts), width), dtype=np.uint8)
+    inside = np.arange(width) < lengths[:, None]
+    heads[inside] = data[positions[inside]]
+    return heads.view("S{}".format(width)).ravel()
+
+
+def classify_columns(title):
+    codes = classify_heads(title, REPORT_PREFIXES)
+    categories = categories_of(REPORT_PREFIXES)
+    return codes == categories.index("ask"), codes == categories.index("show")
+
+
+# Columns read from the CSV hold the titles and timestamps as strings. Columns from the cache hold a title buffer and
+# the timestamps as epoch minutes instead; of those titles only the first `width` bytes are returned.
+def titles_of(columns, width=16):
+    if "title" in columns:
+        return columns["title"]
+    return title_heads(columns["title_offsets"], columns["title_bytes"], width)
+
+
+def hours_of(columns, mask):
+    if "created_minutes" in columns:
+        return columns["created_minutes"][mask] // 60 % 24
+    return parse_hours(columns["created_at"][mask])
+
+
+def hour_totals(hours, num_comments):
+    counts = np.bincount(hours, minlength=24)
+    sums = np.bincount(hours, weights=num_comments, minlength=24).astype(np.int64)
+    return counts, sums
+
+
+def columnar_state(columns):
+    is_ask, is_show = classify_columns(titles_of(columns))
+    num_comments = columns["num_comments"]
+
+    state = new_state()
+    state["ask_posts"] = int(is_ask.sum())
+    state["show_posts"] = int(is_show.sum())
+    state["other_posts"] = int(
+        len(num_comments) - state["ask_posts"] - state["show_posts"]
+    )
+    state["total_ask_comments"] = int(num_comments[is_ask].sum())
+    state["total_show_comments"] = int(num_comments[is_show].sum())
+
+    hours = hours_of(columns, is_ask)
+    counts, sums = hour_totals(hours, num_comments[is_ask])
+    for hour in np.flatnonzero(counts):
+        key = "{:02d}".format(hour)
+        state["counts_by_hour"][key] = int(counts[hour])
+        state["comments_by_hour"][key] = int(sums[hour])
+
+    return state
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else get_path("hacker_news.csv")
+    source = open_source(path)
+    try:
+        columns = load_columns(reader(source))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print_report(columnar_state(columns))
@@ -0,0 +1,152 @@
+# Generator of synthetic files shaped like hacker_news.csv, for benchmarks and tests at sizes we do not have real
+# dumps for. The rows have the same columns and timestamp format as the real file, titles with "Ask HN" and other
+# prefixes in varying spelling, titles with commas and quotes (which the csv writer quotes), and a skewed distribution
+# of comments and points. The same seed always gives the same file.
+#
+# Usage:
+#   python generate.py OUTPUT.csv [--rows 1000000] [--seed 0] [--ask 0.09] [--show 0.06] [--newlines 0.0]
+
+import argparse
+from csv import writer
+
+import numpy as np
+
+HEADERS = ["id", "title", "url", "num_points", "num_comments", "author", "created_at"]
+
+WORDS = (
+    "the a of to and in for on with how why what is are your my we you new open source "
+    "startup data python rust web app api database design learning machine language "
+    "code developer company job hiring remote free tool building first year time"
+).split()
+
+PREFIX_SPELLINGS = {
+    "ask": ["Ask HN: ", "ASK HN: ", "Ask HN - ", "ask hn: "],
+    "show": ["Show HN: ", "SHOW HN: ", "Show HN - ", "show hn: "],
+    "launch": ["Launch HN: "],
+    "tell": ["Tell HN: "],
+}
+
+BATCH_ROWS = 100000
+
+
+def random_titles(rng, n, weights, comma_rate, quote_rate, newline_rate):
+    categories = list(weights) + ["other"]
+    probabilities = list(weights.values())
+    probabilities.append(1 - sum(probabilities))
+    chosen = rng.choice(len(categories), size=n, p=probabilities)
+    lengths = rng.integers(2, 12, size=n)
+    words = rng.integers(0, len(WORDS), size=lengths.sum())
+    spelling = rng.integers(0, 4, size=n)
+    commas = rng.random(n) < comma_rate
+    quotes = rng.random(n) < quote_rate
+    newlines = rng.random(n) < newline_rate
+
+    titles = []
+    start = 0
+    for i in range(n):
+        body = [WORDS[w] for w in words[start : start + lengths[i]]]
+        start += lengths[i]
+        if commas[i]:
+            body.insert(len(body) // 2, "and, of course,")
+        if quotes[i]:
+            body.append('"quoted"')
+        if newlines[i]:
+            body.append("\nsecond line")
+        category = categories[chosen[i]]
+        prefix = ""
+        if category != "other":
+            spellings = PREFIX_SPELLINGS[category]
+            prefix = spellings[spelling[i] % len(spellings)]
+        titles.append(prefix + " ".join(body).capitalize())
+    return titles
+
+
+# Timestamps are formatted like the real file: month, day and hour without leading zeros.
+def random_timestamps(rng, n, start, end):
+    first = np.datetime64(start, "m").astype(np.int64)
+    last = np.datetime64(end, "m").astype(np.int64)
+    moments = rng.integers(first, last, size=n).astype("datetime64[m]")
+    days = moments.astype("datetime64[D]")
+    months = moments.astype("datetime64[M]")
+
+    years = moments.astype("datetime64[Y]").astype(np.int64) + 1970
+    month = months.astype(np.int64) % 12 + 1
+    day = (days - months.astype("datetime64[D]")).astype(np.int64) + 1
+    minute_of_day = (moments - days.astype("datetime64[m]")).astype(np.int64)
+
+    return [
+        "{}/{}/{} {}:{:02d}".format(m, d, y, mi // 60, mi % 60)
+        for m, d, y, mi in zip(
+            month.tolist(), day.tolist(), years.tolist(), minute_of_day.tolist()
+        )
+    ]
+
+
+def generate(
+    path,
+    rows,
+    seed=0,
+    weights=None,
+    comma_rate=0.05,
+    quote_rate=0.01,
+    newline_rate=0.0,
+    start="2015-09-01",
+    end="2016-09-26",
+):
+    weights = weights or {"ask": 0.09, "show": 0.06, "launch": 0.002, "tell": 0.001}
+    rng = np.random.default_rng(seed)
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        out = writer(f)
+        out.writerow(HEADERS)
+        next_id = 10000000
+        for batch_start in range(0, rows, BATCH_ROWS):
+            n = min(BATCH_ROWS, rows - batch_start)
+            titles = random_titles(
+                rng, n, weights, comma_rate, quote_rate, newline_rate
+            )
+            timestamps = random_timestamps(rng, n, start, end)
+            # Most posts get (almost) no comments, a few get hundreds.
+            num_comments = (rng.pareto(1.2, size=n) * 3).astype(np.int64)
+            num_points = num_comments * 2 + rng.integers(1, 20, size=n)
+            ids = next_id + np.arange(n) * 3 + rng.integers(0, 3, size=n)
+            next_id = int(ids[-1]) + 3
+            authors = rng.integers(0, 50000, size=n)
+
+            for i in range(n):
+                out.writerow(
+                    [
+                        ids[i],
+                        titles[i],
+                        "https://example.com/{}".format(ids[i]),
+                        num_points[i],
+                        num_comments[i],
+                        "user{}".format(authors[i]),
+                        timestamps[i],
+                    ]
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic hacker_news.csv")
+    parser.add_argument("output")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ask", type=float, default=0.09, help="share of Ask HN posts")
+    parser.add_argument(
+        "--show", type=float, default=0.06, help="share of Show HN posts"
+    )
+    parser.add_argument("--commas", type=float, default=0.05)
+    parser.add_argument("--quotes", type=float, default=0.01)
+    parser.add_argument("--newlines", type=float, default=0.0)
+    args = parser.parse_args()
+
+    generate(
+        args.output,
+        args.rows,
+        seed=args.seed,
+        weights={"ask": args.ask, "show": args.show, "launch": 0.002, "tell": 0.001},
+        comma_rate=args.commas,
+        quote_rate=args.quotes,
+        newline_rate=args.newlines,
+    )
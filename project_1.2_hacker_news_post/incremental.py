@@ -0,0 +1,140 @@
+# Incremental version of stream.py for a file that grows every day. After a run the state (the comment totals and the
+# counts and comments by hour), the byte offset up to which the file was read and the id of the last post are saved to
+# a checkpoint file. The next run only reads the part of the file after that offset.
+#
+# The checkpoint also stores a digest of the start of the file and of the bytes right before the offset. If the file
+# is now shorter than the offset or one of these bytes changed, the file was truncated or rewritten and the state is
+# computed again from the first row.
+#
+# A last line that does not end with a newline is assumed to still be written and is left for the next run.
+#
+# Usage:
+#   python incremental.py [path/to/dump.csv] [--checkpoint path/to/checkpoint.json] [--reset]
+
+import os
+import json
+import hashlib
+import argparse
+from csv import reader
+
+from stream import get_path, new_state, stream_state, print_report
+
+DIGEST_SIZE = 1 << 16
+
+
+def prefix_digest(path, offset):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        digest.update(f.read(min(offset, DIGEST_SIZE)))
+        f.seek(max(offset - DIGEST_SIZE, 0))
+        digest.update(f.read(min(offset, DIGEST_SIZE)))
+    return digest.hexdigest()
+
+
+def load_checkpoint(checkpoint_path):
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    # Write to a temporary file first, so an interrupted run cannot leave a half-written checkpoint behind.
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def checkpoint_is_valid(path, checkpoint):
+    offset = checkpoint["offset"]
+    if os.path.getsize(path) < offset:
+        return False
+    return prefix_digest(path, offset) == checkpoint["digest"]
+
+
+# Yields the lines of the complete records after the given offset and keeps progress["offset"] at the end of the
+# records handed out so far. A record is complete once it ends with a newline outside of a quoted field.
+def tail_lines(path, progress):
+    with open(path, "rb") as f:
+        f.seek(progress["offset"])
+        pending = []
+        in_quotes = False
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            pending.append(line)
+            in_quotes ^= line.count(b'"') % 2 == 1
+            if not in_quotes:
+                progress["offset"] += sum(len(l) for l in pending)
+                for l in pending:
+                    yield l.decode("utf-8")
+                pending = []
+
+
+def remember_last_id(rows, headers, progress):
+    rows = iter(rows)
+    if headers is None:
+        headers = next(rows, None)
+        if headers is None:
+            return
+        progress["headers"] = headers
+        yield headers
+    id_col = headers.index("id")
+    for row in rows:
+        progress["last_id"] = row[id_col]
+        yield row
+
+
+def incremental_state(path, checkpoint_path, reset=False):
+    checkpoint = None if reset else load_checkpoint(checkpoint_path)
+    if checkpoint is not None and not checkpoint_is_valid(path, checkpoint):
+        print(
+            "Checkpoint does not match {p}, starting from the first row".format(p=path)
+        )
+        checkpoint = None
+
+    if checkpoint is None:
+        checkpoint = {
+            "offset": 0,
+            "headers": None,
+            "last_id": None,
+            "state": new_state(),
+        }
+
+    progress = {
+        "offset": checkpoint["offset"],
+        "headers": checkpoint["headers"],
+        "last_id": checkpoint["last_id"],
+    }
+    rows = remember_last_id(
+        reader(tail_lines(path, progress)), checkpoint["headers"], progress
+    )
+    state = stream_state(rows, state=checkpoint["state"], headers=checkpoint["headers"])
+
+    checkpoint = {
+        "offset": progress["offset"],
+        "digest": prefix_digest(path, progress["offset"]),
+        "headers": progress["headers"],
+        "last_id": progress["last_id"],
+        "state": state,
+    }
+    save_checkpoint(checkpoint_path, checkpoint)
+    return state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Incremental Hacker News comment analysis"
+    )
+    parser.add_argument("path", nargs="?", default=get_path("hacker_news.csv"))
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="ignore the checkpoint and read the whole file",
+    )
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or args.path + ".checkpoint.json"
+    print_report(incremental_state(args.path, checkpoint_path, reset=args.reset))
@@ -0,0 +1,158 @@
+# Multi-process version of stream.py. The input (a single CSV file or a directory of CSV shards, e.g. one per month) is
+# split into byte ranges. Every worker process reads one range and computes a partial state with stream_state, after
+# which the parent merges the partial states and prints the same report as Main.py.
+#
+# Titles may be quoted and contain newlines, so not every newline in the file ends a record. A newline ends a record
+# only if it is preceded by an even number of quote characters (escaped quotes are written as "" and do not change
+# the parity). Finding the split points is a parallel pass of its own: every worker counts the quotes in a raw byte
+# range with bytes.count, which is much cheaper than parsing the CSV, and notes the first newline of the range after
+# an even and after an odd number of quotes within it. The parent goes over the ranges in order, keeping the quote
+# parity at the start of every range, and picks the newline that ends a record. The second pass parses the ranges
+# between these split points.
+#
+# Usage:
+#   python shards.py [path/to/dump.csv | path/to/shard_dir] [-p PROCESSES] [--sketches]
+
+import os
+import argparse
+from csv import reader
+from multiprocessing import Pool
+
+from stream import get_path, new_state, stream_state, merge_states, print_report
+from sketches import new_sketches, stream_sketches, merge_sketches, print_sketches
+
+BLOCK_SIZE = 1 << 24
+MIN_RANGE_SIZE = 1 << 20
+
+
+def input_files(path):
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path) if name.endswith(".csv"))
+        return [os.path.join(path, name) for name in names]
+    return [path]
+
+
+def byte_ranges(path, range_size):
+    size = os.path.getsize(path)
+    return [
+        (path, start, min(start + range_size, size))
+        for start in range(0, size, range_size)
+    ]
+
+
+# Returns the parity of the number of quotes in the byte range, and the offsets just after the first newline in it
+# that follows an even and an odd number of quotes from the start of the range (None if there is no such newline).
+def scan_range(task):
+    path, start, end = task
+    quotes = 0
+    first = [None, None]
+
+    with open(path, "rb") as f:
+        f.seek(start)
+        pos = start
+        while pos < end:
+            block = f.read(min(BLOCK_SIZE, end - pos))
+            if not block:
+                break
+            offset = 0
+            while None in first:
+                newline = block.find(b"\n", offset)
+                if newline == -1:
+                    break
+                quotes += block.count(b'"', offset, newline)
+                if first[quotes % 2] is None:
+                    first[quotes % 2] = pos + newline + 1
+                offset = newline + 1
+            quotes += block.count(b'"', offset)
+            pos += len(block)
+
+    return quotes % 2, first
+
+
+# The record boundaries of every file from the scanned byte ranges: a range that starts outside of quotes ends its
+# first record at the first newline after an even number of quotes, otherwise after an odd number. The first range
+# starts at the header, so its boundary is the start of the data.
+def file_ranges(path, scanned):
+    size = os.path.getsize(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        headers = next(reader(f), None)
+    if headers is None:
+        return []
+
+    offsets = []
+    in_quotes = 0
+    for quotes, first in scanned:
+        if first[in_quotes] is not None:
+            offsets.append(first[in_quotes])
+        in_quotes ^= quotes
+    offsets.append(size)
+    return [
+        (path, headers, start, end)
+        for start, end in zip(offsets, offsets[1:])
+        if start < end
+    ]
+
+
+def read_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        for line in f:
+            if remaining <= 0:
+                break
+            remaining -= len(line)
+            yield line.decode("utf-8")
+
+
+def range_state(task):
+    path, headers, start, end = task
+    return stream_state(reader(read_range(path, start, end)), headers=headers)
+
+
+def range_sketches(task):
+    path, headers, start, end = task
+    return stream_sketches(reader(read_range(path, start, end)), headers=headers)
+
+
+def run_sharded(path, processes, range_func, merge_func, state):
+    processes = processes or os.cpu_count()
+    files = input_files(path)
+
+    # Several ranges per process, so that a slow range does not leave the other processes idle at the end.
+    total_size = sum(os.path.getsize(f) for f in files)
+    range_size = max(total_size // (processes * 4), MIN_RANGE_SIZE)
+    chunks = [byte_ranges(f, range_size) for f in files]
+
+    with Pool(processes) as pool:
+        scanned = iter(pool.map(scan_range, [c for ranges in chunks for c in ranges]))
+        tasks = [
+            task
+            for f, ranges in zip(files, chunks)
+            for task in file_ranges(f, [next(scanned) for _ in ranges])
+        ]
+        for partial in pool.imap_unordered(range_func, tasks):
+            state = merge_func(state, partial)
+    return state
+
+
+def sharded_state(path, processes=None):
+    return run_sharded(path, processes, range_state, merge_states, new_state())
+
+
+def sharded_sketches(path, processes=None):
+    return run_sharded(path, processes, range_sketches, merge_sketches, new_sketches())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded Hacker News comment analysis")
+    parser.add_argument("path", nargs="?", default=get_path("hacker_news.csv"))
+    parser.add_argument("-p", "--processes", type=int, default=None)
+    parser.add_argument(
+        "--sketches", action="store_true", help="report quantiles and top posts"
+    )
+    args = parser.parse_args()
+
+    if args.sketches:
+        print_sketches(sharded_sketches(args.path, args.processes))
+    else:
+        print_report(sharded_state(args.path, args.processes))
@@ -0,0 +1,286 @@
+# Quantiles and top-k posts of the number of comments per group. The averages in Main.py hide how skewed the comment
+# counts are, so for every category (ask, show, other) and for every hour of the "Ask HN" posts we also report the
+# median, p90 and p99 number of comments and the most commented posts.
+#
+# Both are computed with bounded memory, so they also work for dumps that do not fit in memory:
+# - The quantiles come from a KLL sketch. Values are collected in levels; when a level is full it is sorted and every
+#   other value moves up one level, where it counts twice as much. Level h holds values of weight 2^h and the capacity
+#   of the lower levels shrinks geometrically, so the sketch holds O(k log(n / k)) values.
+# - The top-k posts are kept in a min-heap of size k.
+# Two sketches can be merged into one, so partial results of shards.py can be combined.
+#
+# The sketches are plain dicts and lists, like the state in stream.py.
+#
+# Usage:
+#   python sketches.py [path/to/dump.csv | -] [--cache] [--top 5]
+
+import sys
+import math
+import heapq
+import argparse
+from csv import reader
+
+import numpy as np
+
+from stream import get_path, open_source, post_hour, REPORT_PREFIXES, REPORT_TRIE
+from classify import classify_title
+
+QUANTILES = [0.5, 0.9, 0.99]
+
+
+def new_quantile_sketch(k=1000):
+    return {"k": k, "n": 0, "coin": 0, "levels": [[]]}
+
+
+def level_capacity(k, depth, level):
+    return max(2, math.ceil(k * (2 / 3) ** (depth - level - 1)))
+
+
+# Compacts every level that is over its capacity. Whether the even or the odd values move up is decided by a hashed
+# counter instead of a random generator, so the result is reproducible while the rounding errors still cancel out on
+# average.
+def compress(sketch):
+    levels = sketch["levels"]
+    h = 0
+    while h < len(levels):
+        items = levels[h]
+        if len(items) >= level_capacity(sketch["k"], len(levels), h):
+            if h + 1 == len(levels):
+                levels.append([])
+            items.sort()
+            keep = [items.pop()] if len(items) % 2 == 1 else []
+            sketch["coin"] += 1
+            levels[h + 1].extend(items[(sketch["coin"] * 2654435761 >> 13) & 1 :: 2])
+            levels[h] = keep
+            # Adding a level lowers the capacity of the levels below it, so start over.
+            h = 0
+        else:
+            h += 1
+
+
+def update_quantiles(sketch, value):
+    levels = sketch["levels"]
+    levels[0].append(value)
+    sketch["n"] += 1
+    if len(levels[0]) >= level_capacity(sketch["k"], len(levels), 0):
+        compress(sketch)
+
+
+def update_quantiles_many(sketch, values):
+    values = list(values)
+    start = 0
+    while start < len(values):
+        levels = sketch["levels"]
+        room = max(level_capacity(sketch["k"], len(levels), 0) - len(levels[0]), 1)
+        batch = values[start : start + room]
+        levels[0].extend(batch)
+        sketch["n"] += len(batch)
+        start += len(batch)
+        compress(sketch)
+
+
+def merge_quantiles(sketch, other):
+    merged = new_quantile_sketch(max(sketch["k"], other["k"]))
+    depth = max(len(sketch["levels"]), len(other["levels"]))
+    merged["levels"] = [[] for _ in range(depth)]
+    for source in (sketch, other):
+        for h, items in enumerate(source["levels"]):
+            merged["levels"][h].extend(items)
+    merged["n"] = sketch["n"] + other["n"]
+    merged["coin"] = sketch["coin"] + other["coin"]
+    compress(merged)
+    return merged
+
+
+def quantile(sketch, q):
+    weighted = sorted(
+        (value, 2**h) for h, items in enumerate(sketch["levels"]) for value in items
+    )
+    if not weighted:
+        return None
+    target = q * sketch["n"]
+    cumulative = 0
+    for value, weight in weighted:
+        cumulative += weight
+        if cumulative >= target:
+            return value
+    return weighted[-1][0]
+
+
+def new_top_k(k=10):
+    return {"k": k, "heap": []}
+
+
+def update_top_k(top, num_comments, post_id, title):
+    item = [num_comments, post_id, title]
+    if len(top["heap"]) < top["k"]:
+        heapq.heappush(top["heap"], item)
+    elif item > top["heap"][0]:
+        heapq.heapreplace(top["heap"], item)
+
+
+def merge_top_k(top, other):
+    merged = new_top_k(max(top["k"], other["k"]))
+    for item in top["heap"] + other["heap"]:
+        update_top_k(merged, *item)
+    return merged
+
+
+def top_posts(top):
+    return sorted(top["heap"], reverse=True)
+
+
+# The groups are the categories and "ask HH" for every hour of the "Ask HN" posts.
+def new_sketches(k=1000, top=10):
+    return {"k": k, "top": top, "groups": {}}
+
+
+def group_sketch(sketches, name):
+    groups = sketches["groups"]
+    if name not in groups:
+        groups[name] = {
+            "posts": 0,
+            "comments": 0,
+            "quantiles": new_quantile_sketch(sketches["k"]),
+            "top": new_top_k(sketches["top"]),
+        }
+    return groups[name]
+
+
+def group_names(category, created_at):
+    if category == "ask":
+        return [category, "ask " + post_hour(created_at)]
+    return [category]
+
+
+def update_sketches(sketches, post_id, title, num_comments, created_at):
+    category = classify_title(REPORT_TRIE, title)
+    for name in group_names(category, created_at):
+        group = group_sketch(sketches, name)
+        group["posts"] += 1
+        group["comments"] += num_comments
+        update_quantiles(group["quantiles"], num_comments)
+        update_top_k(group["top"], num_comments, post_id, title)
+
+
+def stream_sketches(rows, sketches=None, headers=None):
+    if sketches is None:
+        sketches = new_sketches()
+
+    rows = iter(rows)
+    if headers is None:
+        headers = next(rows, None)
+        if headers is None:
+            return sketches
+    id_col = headers.index("id")
+    title_col = headers.index("title")
+    comments_col = headers.index("num_comments")
+    created_col = headers.index("created_at")
+
+    for row in rows:
+        update_sketches(
+            sketches,
+            int(row[id_col]),
+            row[title_col],
+            int(row[comments_col]),
+            row[created_col],
+        )
+
+    return sketches
+
+
+def merge_sketches(sketches, other):
+    merged = new_sketches(sketches["k"], sketches["top"])
+    for name in set(sketches["groups"]) | set(other["groups"]):
+        empty = group_sketch(new_sketches(sketches["k"], sketches["top"]), name)
+        group = sketches["groups"].get(name, empty)
+        other_group = other["groups"].get(name, empty)
+        merged["groups"][name] = {
+            "posts": group["posts"] + other_group["posts"],
+            "comments": group["comments"] + other_group["comments"],
+            "quantiles": merge_quantiles(group["quantiles"], other_group["quantiles"]),
+            "top": merge_top_k(group["top"], other_group["top"]),
+        }
+    return merged
+
+
+# Same result from the cached columns (see cache.py). Every group is fed to its sketch as one array, and the top-k
+# posts are found with a sort on the group, so only their titles have to be decoded.
+def columnar_sketches(columns, k=1000, top=10):
+    from columnar import title_heads
+    from classify import categories_of, classify_heads
+
+    offsets = columns["title_offsets"]
+    title_bytes = columns["title_bytes"]
+    num_comments = np.asarray(columns["num_comments"])
+    ids = np.asarray(columns["id"])
+    hours = np.asarray(columns["created_minutes"]) // 60 % 24
+
+    categories = categories_of(REPORT_PREFIXES)
+    codes = classify_heads(title_heads(offsets, title_bytes), REPORT_PREFIXES)
+
+    masks = {}
+    for code, category in enumerate(categories):
+        masks[category] = codes == code
+    for hour in range(24):
+        masks["ask {:02d}".format(hour)] = masks["ask"] & (hours == hour)
+
+    sketches = new_sketches(k, top)
+    for name, mask in masks.items():
+        rows = np.flatnonzero(mask)
+        if len(rows) == 0:
+            continue
+        group = group_sketch(sketches, name)
+        values = num_comments[rows]
+        group["posts"] = len(rows)
+        group["comments"] = int(values.sum())
+        update_quantiles_many(group["quantiles"], values.tolist())
+        for row in rows[np.lexsort((ids[rows], values))[::-1][:top]]:
+            title = bytes(title_bytes[offsets[row] : offsets[row + 1]]).decode("utf-8")
+            update_top_k(group["top"], int(num_comments[row]), int(ids[row]), title)
+    return sketches
+
+
+def print_sketches(sketches, top=5):
+    for name in sorted(sketches["groups"]):
+        group = sketches["groups"][name]
+        values = [quantile(group["quantiles"], q) for q in QUANTILES]
+        print(
+            "{g}: {n} posts, mean {mean:.2f}, median {p50}, p90 {p90}, p99 {p99}".format(
+                g=name,
+                n=group["posts"],
+                mean=group["comments"] / group["posts"],
+                p50=values[0],
+                p90=values[1],
+                p99=values[2],
+            )
+        )
+        for num_comments, post_id, title in top_posts(group["top"])[:top]:
+            print(
+                "    {c:>6} comments  {i}  {t}".format(
+                    c=num_comments, i=post_id, t=title
+                )
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Hacker News comment quantiles and top posts"
+    )
+    parser.add_argument("path", nargs="?", default=get_path("hacker_news.csv"))
+    parser.add_argument("--cache", action="store_true", help="use the columnar cache")
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.cache:
+        from cache import load_cached
+
+        sketches = columnar_sketches(load_cached(args.path)[0], top=args.top)
+    else:
+        source = open_source(args.path)
+        try:
+            sketches = stream_sketches(reader(source), new_sketches(top=args.top))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+    print_sketches(sketches, args.top)
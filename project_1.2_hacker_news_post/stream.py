@@ -0,0 +1,131 @@
+# Streaming version of the analysis in Main.py. Instead of loading the whole CSV into memory, we read the rows one at
+# a time and only keep the running totals. Memory use is therefore constant, no matter how large the dump is.
+#
+# Usage:
+#   python stream.py                      (reads hacker_news.csv next to this file)
+#   python stream.py path/to/dump.csv     (reads the given file, .gz files are decompressed on the fly)
+#   zcat dump.csv.gz | python stream.py - (reads from stdin)
+
+import os
+import sys
+import gzip
+from csv import reader
+import datetime as dt
+
+from classify import build_trie, classify_title
+
+# The report only looks at "Ask HN" and "Show HN" posts, see classify.py for other prefixes.
+REPORT_PREFIXES = {"ask hn": "ask", "show hn": "show"}
+REPORT_TRIE = build_trie(REPORT_PREFIXES)
+
+
+def get_path(path):
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    return os.path.join(dir_path, path)
+
+
+def open_source(path):
+    if path is None or path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline="", encoding="utf-8")
+    return open(path, newline="", encoding="utf-8")
+
+
+# The state holds everything needed to produce the report. It only contains numbers and small dicts keyed by hour, so
+# its size does not depend on the number of posts.
+def new_state():
+    return {
+        "ask_posts": 0,
+        "show_posts": 0,
+        "other_posts": 0,
+        "total_ask_comments": 0,
+        "total_show_comments": 0,
+        "counts_by_hour": {},
+        "comments_by_hour": {},
+    }
+
+
+def post_hour(created_at):
+    return dt.datetime.strptime(created_at, "%m/%d/%Y %H:%M").strftime("%H")
+
+
+def update_state(state, title, num_comments, created_at):
+    category = classify_title(REPORT_TRIE, title)
+    if category == "ask":
+        state["ask_posts"] += 1
+        state["total_ask_comments"] += num_comments
+
+        hour = post_hour(created_at)
+        counts_by_hour = state["counts_by_hour"]
+        comments_by_hour = state["comments_by_hour"]
+        counts_by_hour[hour] = counts_by_hour.get(hour, 0) + 1
+        comments_by_hour[hour] = comments_by_hour.get(hour, 0) + num_comments
+    elif category == "show":
+        state["show_posts"] += 1
+        state["total_show_comments"] += num_comments
+    else:
+        state["other_posts"] += 1
+
+
+# The columns are looked up by name in the header, so dumps with extra or reordered columns can be read as well. When
+# only a part of a file is read (see shards.py), the header of that file is passed in separately.
+def stream_state(rows, state=None, headers=None):
+    if state is None:
+        state = new_state()
+
+    rows = iter(rows)
+    if headers is None:
+        headers = next(rows, None)
+        if headers is None:
+            return state
+    title_col = headers.index("title")
+    comments_col = headers.index("num_comments")
+    created_col = headers.index("created_at")
+
+    for row in rows:
+        update_state(state, row[title_col], int(row[comments_col]), row[created_col])
+
+    return state
+
+
+# States of different parts of the data can be combined, since all values are plain counts and sums.
+def merge_states(state, other):
+    merged = new_state()
+    for key, value in state.items():
+        if isinstance(value, dict):
+            for hour in set(value) | set(other[key]):
+                merged[key][hour] = value.get(hour, 0) + other[key].get(hour, 0)
+        else:
+            merged[key] = value + other[key]
+    return merged
+
+
+def avg_by_hour(state):
+    counts_by_hour = state["counts_by_hour"]
+    comments_by_hour = state["comments_by_hour"]
+    return [
+        [hour, comments_by_hour[hour] / counts_by_hour[hour]]
+        for hour in comments_by_hour
+    ]
+
+
+def sorted_swap(state):
+    return sorted([[avg, hour] for hour, avg in avg_by_hour(state)], reverse=True)
+
+
+def print_report(state, top=5):
+    print("Top {n} Hours for Ask Posts Comments (Timezone: EST)".format(n=top))
+    for val in sorted_swap(state)[:top]:
+        print("{h}:00 {avg:.2f} average comments per post".format(h=val[1], avg=val[0]))
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else get_path("hacker_news.csv")
+    source = open_source(path)
+    try:
+        state = stream_state(reader(source))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print_report(state)
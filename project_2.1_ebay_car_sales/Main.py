@@ -1,6 +1,8 @@
 import os
-import pandas as pd
-import numpy as np
+
+from brands import brand_summary
+from dedup import HASH_COLUMN, drop_duplicates
+from snapshot import load_autos
 
 # The aim of this project is to clean and analyze a data set of used car listings on German eBay.
 
@@ -10,35 +12,39 @@ def get_path(path):
     return os.path.join(dir_path, path)
 
 
-autos = pd.read_csv(get_path("autos.csv"), encoding="Latin-1")
-
-# autos.info()
-# autos.head()
+# The listings are read in chunks with compact dtypes, and every chunk is renamed, cleaned and filtered as described below before the next one is read (see ingest.py). That way only the listings that survive the cleaning are kept in memory. The cleaned frame is saved as a columnar snapshot next to the CSV, so later runs memory-map it instead of cleaning again (see snapshot.py).
 
-# print(autos.columns)
+# The listing titles in "name" are not used below, so they are not loaded. The hashes that identify a listing (HASH_COLUMN) are stored in the snapshot and loaded instead.
 
-autos.columns = [
+columns = [
     "date_crawled",
-    "name",
-    "seller",
-    "offer_type",
-    "price",
+    "price_dollar",
     "abtest",
     "vehicle_type",
     "registration_year",
     "gearbox",
     "power_ps",
     "model",
-    "odometer",
+    "odometer_km",
     "registration_month",
     "fuel_type",
     "brand",
     "unrepaired_damage",
     "ad_created",
-    "nr_of_pictures",
     "postal_code",
     "last_seen",
+    HASH_COLUMN,
 ]
+autos, _ = load_autos(get_path("autos.csv"), columns=columns)
+
+# The crawler captured some listings more than once, on different days. These copies would count twice in every average below, so only the first copy of each listing is kept (see dedup.py, which uses the stored hashes).
+
+autos = drop_duplicates(autos)
+
+# autos.info()
+# autos.head()
+
+# print(autos.columns)
 
 # autos.describe(include="all")
 
@@ -50,7 +56,7 @@ autos.columns = [
 
 # "seller", "offer_type" and "nr_of_pictures" are mostly one value and will be dropped due to not being interesting for analysis
 
-autos.drop(["seller", "offer_type", "nr_of_pictures"], axis=1)
+# These columns are not read at all (DROPPED_COLUMNS in ingest.py).
 
 
 # Now let us clean "price" and "odometer" so that they can be stored as numeric data instead of strings
@@ -59,12 +65,7 @@ autos.drop(["seller", "offer_type", "nr_of_pictures"], axis=1)
 # print(autos["odometer"].unique())
 
 
-autos["price"] = autos["price"].str.replace("$", "").str.replace(",", "").astype(int)
-autos["odometer"] = (
-    autos["odometer"].str.replace("km", "").str.replace(",", "").astype(int)
-)
-autos.rename(columns={"price": "price_dollar"}, inplace=True)
-autos.rename(columns={"odometer": "odometer_km"}, inplace=True)
+# clean_chunk in ingest.py parses the digits out of the text in one pass, skipping "$", "," and "km" (see numeric.py), converts the columns to integers and renames them to "price_dollar" and "odometer_km".
 
 
 # print(autos["price_dollar"].unique().shape)
@@ -72,7 +73,7 @@ autos.rename(columns={"odometer": "odometer_km"}, inplace=True)
 
 # Prices increase steadily till about $350.000, after which they bceome unrealistically high. Let us remove these listings. Prices of $1 are not necessarily unrealistic as these could simply be the opening bids.
 
-autos = autos[autos["price_dollar"].between(1, 350001)]
+# This filter (PRICE_RANGE in OUTLIER_RULES in ingest.py) is applied to every chunk while reading. Rules with thresholds computed from the data, such as IQR, MAD or per-brand quantiles, are described in outliers.py; the thresholds that were applied are in autos.attrs["outlier_thresholds"].
 
 
 # autos["odometer_km"].unique().shape
@@ -84,19 +85,27 @@ autos = autos[autos["price_dollar"].between(1, 350001)]
 # autos[['date_crawled','ad_created','last_seen']][0:5]
 
 
+# The three date columns are parsed to datetime64 while reading (parse_dates in ingest.py), so the dates are taken with .dt.normalize() instead of slicing strings.
+
 # print(
 #     autos["date_crawled"]
-#     .str[:10]
+#     .dt.normalize()
 #     .value_counts(normalize=True, dropna=False)
 #     .sort_index()
 # )
 # print(
-#     autos["ad_created"].str[:10].value_counts(normalize=True, dropna=False).sort_index()
+#     autos["ad_created"].dt.normalize().value_counts(normalize=True, dropna=False).sort_index()
 # )
 # print(
-#     autos["last_seen"].str[:10].value_counts(normalize=True, dropna=False).sort_index()
+#     autos["last_seen"].dt.normalize().value_counts(normalize=True, dropna=False).sort_index()
 # )
 
+# How long listings stay online (last_seen - ad_created) per brand, model or price band is computed in lifetimes.py, e.g.
+
+# print(lifetime_summary(autos, "brand"))
+# print(lifetime_summary(autos, ["brand", "model"]))
+# print(lifetime_summary(autos, "price_band"))
+
 
 autos["registration_year"].describe()
 
@@ -108,7 +117,7 @@ autos["registration_year"].describe()
 
 # Cars cannot be registered before they were invented or after the listings were posted, so these incorrect values have to be pruned. All values before 1900 and after 2016 will be considered wrong.
 
-autos = autos[autos["registration_year"].between(1900, 2016)]
+# This filter (REGISTRATION_YEAR_RANGE in OUTLIER_RULES in ingest.py) is applied to every chunk while reading as well.
 
 # print(
 #     autos["registration_year"].value_counts(normalize=True, dropna=False).head(10)
@@ -126,29 +135,28 @@ brand_counts = autos["brand"].value_counts(normalize=True)
 sel_brands = brand_counts[brand_counts > 0.05].index
 
 
-brand_data = {}
-for b in sel_brands:
-    sel_rows = autos[autos["brand"] == b]
-    brand_data[b] = int(sel_rows["price_dollar"].mean())
+# The average price and mileage of all selected brands are computed in one grouped aggregation (see brands.py). Pass extra=True for the number of listings, medians and quartiles as well.
 
-# print("Average prices in dollars")
-# print(brand_data)
-
-# "BMW", "Mercedes" and "Audi" cars are significantly more expensive than "Opel" and "Ford" cars, which are very cheap. "Volkswagen" cars are in between, which could explain its popularity.
+brand_df = brand_summary(autos, sel_brands)
 
-# Let us now do the same for mileage and then combine the data into a new dataframe
+# For summaries over several dimensions, cube.py aggregates the listings once into counts and sums per brand, model, vehicle type, fuel type and registration year; roll-ups are then computed from the cube, e.g.
 
-mileage_data = {}
-for b in sel_brands:
-    sel_rows = autos[autos["brand"] == b]
-    mileage_data[b] = int(sel_rows["odometer_km"].mean())
+# cube = update_cube(new_cube(), autos)
+# print(rollup(cube, "brand").loc[brand_df.index])
+# print(rollup(cube, ["brand", "fuel_type"]))
 
-brand_data_series = pd.Series(brand_data).sort_values(ascending=False)
-mileage_data_series = pd.Series(mileage_data)
+# print("Average prices in dollars")
+# print(brand_df["average_price_dollar"])
 
-brand_df = pd.DataFrame(data=brand_data_series, columns=["average_price_dollar"])
-brand_df["average_odometer_km"] = mileage_data_series
+# "BMW", "Mercedes" and "Audi" cars are significantly more expensive than "Opel" and "Ford" cars, which are very cheap. "Volkswagen" cars are in between, which could explain its popularity.
 
 print(brand_df)
 
 # There is no signifcant correlation between average price and average mileage.
+
+
+# "postal_code" has not been used so far. With a table of German postal codes and their coordinates next to this file (not part of the repository, see geo.py), prices can be compared per federal state and with the listings nearby, e.g.
+
+# postal_codes = load_postal_codes(get_path(POSTAL_CODES_FILE))
+# print(region_price_stats(autos, postal_codes))
+# print(neighbour_prices(autos, postal_codes).describe())
@@ -0,0 +1,60 @@
+# Memory of the cleaned autos frame with every string column stored as strings versus with the low-cardinality ones
+# stored as categories, as read_autos chooses them (see category_columns in ingest.py), and the time of a brand
+# comparison on both.
+#
+# Usage:
+#   python bench_memory.py [path/to/autos.csv]
+
+import os
+import sys
+import time
+
+from ingest import read_autos, category_columns
+
+
+def megabytes(n):
+    return n / (1 << 20)
+
+
+if __name__ == "__main__":
+    path = (
+        sys.argv[1]
+        if len(sys.argv) > 1
+        else os.path.join(os.path.dirname(os.path.realpath(__file__)), "autos.csv")
+    )
+
+    categories = category_columns(path)
+    plain = read_autos(path, categories=[])
+    encoded = read_autos(path, categories=categories)
+
+    plain_usage = plain.memory_usage(deep=True, index=False)
+    encoded_usage = encoded.memory_usage(deep=True, index=False)
+
+    print("{:>20} {:>12} {:>14}".format("column", "str (MB)", "category (MB)"))
+    for column in categories:
+        print(
+            "{:>20} {:>12.2f} {:>14.2f}".format(
+                column,
+                megabytes(plain_usage[column]),
+                megabytes(encoded_usage[column]),
+            )
+        )
+    print(
+        "{:>20} {:>12.2f} {:>14.2f} ({:.1f}x smaller)".format(
+            "whole frame",
+            megabytes(plain_usage.sum()),
+            megabytes(encoded_usage.sum()),
+            plain_usage.sum() / encoded_usage.sum(),
+        )
+    )
+
+    brand = plain["brand"].mode()[0]
+    for name, frame in [("str", plain), ("category", encoded)]:
+        start = time.perf_counter()
+        for _ in range(10):
+            frame["brand"] == brand
+        print(
+            "{:>20} {:.2f} ms per brand comparison".format(
+                name, (time.perf_counter() - start) * 100
+            )
+        )
@@ -0,0 +1,56 @@
+# Benchmark of the price and odometer parsing: the str.replace chain that Main.py used versus parse_int from
+# numeric.py, on generated values in the same format as autos.csv.
+#
+# Usage:
+#   python bench_numeric.py [size ...]      (default size: 10000000)
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from numeric import parse_int
+
+
+def replace_chain(prices, odometers):
+    price = prices.str.replace("$", "").str.replace(",", "").astype(int)
+    odometer = odometers.str.replace("km", "").str.replace(",", "").astype(int)
+    return price, odometer
+
+
+def vectorized(prices, odometers):
+    return parse_int(prices), parse_int(odometers)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or [10000000]
+    rng = np.random.default_rng(0)
+
+    print(
+        "{:>10} {:>12} {:>12} {:>9}".format("rows", "chain (s)", "parse (s)", "speedup")
+    )
+    for size in sizes:
+        prices = pd.Series(rng.lognormal(8.3, 1.1, size).astype(np.int64))
+        prices = "$" + prices.map("{:,}".format)
+        odometers = pd.Series(rng.choice([5000, 90000, 125000, 150000], size))
+        odometers = odometers.map("{:,}".format) + "km"
+
+        chain_time, (chain_price, chain_odometer) = timed(
+            replace_chain, prices, odometers
+        )
+        parse_time, (parse_price, parse_odometer) = timed(vectorized, prices, odometers)
+        assert (chain_price == parse_price).all()
+        assert (chain_odometer == parse_odometer).all()
+
+        print(
+            "{:>10} {:>12.3f} {:>12.3f} {:>8.1f}x".format(
+                size, chain_time, parse_time, chain_time / parse_time
+            )
+        )
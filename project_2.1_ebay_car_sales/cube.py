@@ -0,0 +1,132 @@
+# Aggregation cube over the cleaned autos data. Every combination of brand, model, vehicle type, fuel type and
+# registration year that occurs in the listings is one cell, and a cell holds the number of listings and the sum and
+# sum of squares of the price and the odometer. A cell is stored as the codes of its labels (positions in the label
+# list of every dimension, -1 for a missing value), so the cube is a few small arrays no matter how many listings went
+# into it.
+#
+# Counts, sums and sums of squares add up, so any roll-up (e.g. per brand, as brand_df in Main.py) is a grouped sum
+# over the cells instead of over the listings, and a new crawl batch is added by aggregating only the batch and summing
+# its cells into the cube. Sums are exact as long as they stay below 2**53; the sums of squares are floats.
+#
+# Usage:
+#   cube = update_cube(new_cube(), autos)
+#   cube = update_cube(cube, next_batch)
+#   rollup(cube, "brand")
+
+import json
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ["brand", "model", "vehicle_type", "fuel_type", "registration_year"]
+MEASURES = ["price_dollar", "odometer_km"]
+
+
+def new_cube(dimensions=DIMENSIONS, measures=MEASURES):
+    cells = {"count": np.zeros(0, dtype=np.int64)}
+    for measure in measures:
+        cells["sum_" + measure] = np.zeros(0, dtype=np.int64)
+        cells["sumsq_" + measure] = np.zeros(0, dtype=np.float64)
+    return {
+        "dimensions": list(dimensions),
+        "measures": list(measures),
+        "labels": {dimension: [] for dimension in dimensions},
+        "codes": np.zeros((0, len(dimensions)), dtype=np.int32),
+        "cells": cells,
+    }
+
+
+# Labels that were not seen before are appended, so the codes of the cells already in the cube stay valid.
+def encode(values, labels):
+    new = pd.Index(values.dropna().unique()).difference(pd.Index(labels))
+    labels = labels + sorted(new.tolist())
+    return pd.Categorical(values, categories=labels).codes.astype(np.int32), labels
+
+
+# Sums the values of the rows (listings or cells) with the same codes; returns the distinct codes and their sums.
+def group_sum(codes, values, sizes):
+    keys = np.zeros(len(codes), dtype=np.int64)
+    for j, size in enumerate(sizes):
+        keys = keys * (size + 1) + (codes[:, j].astype(np.int64) + 1)
+    unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    sums = {}
+    for name, value in values.items():
+        total = np.bincount(inverse, weights=value, minlength=len(unique))
+        sums[name] = (
+            total if value.dtype.kind == "f" else np.rint(total).astype(np.int64)
+        )
+    return codes[first], sums
+
+
+def update_cube(cube, autos):
+    labels = {}
+    columns = []
+    for dimension in cube["dimensions"]:
+        codes, labels[dimension] = encode(autos[dimension], cube["labels"][dimension])
+        columns.append(codes)
+    codes = np.column_stack(columns) if columns else np.zeros((len(autos), 0), np.int32)
+
+    values = {"count": np.ones(len(autos), dtype=np.int64)}
+    for measure in cube["measures"]:
+        value = autos[measure].to_numpy()
+        values["sum_" + measure] = value.astype(np.int64)
+        values["sumsq_" + measure] = value.astype(np.float64) ** 2
+
+    sizes = [len(labels[dimension]) for dimension in cube["dimensions"]]
+    codes = np.concatenate([cube["codes"], codes])
+    values = {
+        name: np.concatenate([cube["cells"][name], value])
+        for name, value in values.items()
+    }
+    codes, cells = group_sum(codes, values, sizes)
+    return dict(cube, labels=labels, codes=codes, cells=cells)
+
+
+def rollup(cube, by):
+    by = [by] if isinstance(by, str) else list(by)
+    positions = [cube["dimensions"].index(dimension) for dimension in by]
+    sizes = [len(cube["labels"][dimension]) for dimension in by]
+    codes, cells = group_sum(cube["codes"][:, positions], cube["cells"], sizes)
+
+    index = pd.MultiIndex.from_arrays(
+        [
+            pd.Categorical.from_codes(codes[:, j], cube["labels"][dimension])
+            for j, dimension in enumerate(by)
+        ],
+        names=by,
+    )
+    if len(by) == 1:
+        index = index.get_level_values(0)
+
+    count = cells["count"]
+    summary = pd.DataFrame({"listings": count}, index=index)
+    for measure in cube["measures"]:
+        total = cells["sum_" + measure]
+        mean = total / count
+        # Sample variance, as Series.std computes it.
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variance = (cells["sumsq_" + measure] - total * mean) / (count - 1)
+        summary["mean_" + measure] = mean
+        summary["std_" + measure] = np.sqrt(np.clip(variance, 0, None))
+    return summary
+
+
+def save_cube(cube, path):
+    header = {key: cube[key] for key in ["dimensions", "measures", "labels"]}
+    np.savez(
+        path,
+        header=np.array(json.dumps(header, default=int)),
+        codes=cube["codes"],
+        **cube["cells"]
+    )
+
+
+def load_cube(path):
+    with np.load(path) as data:
+        cube = json.loads(str(data["header"]))
+        cube["codes"] = data["codes"]
+        cube["cells"] = {
+            name: data[name] for name in data.files if name not in ("header", "codes")
+        }
+    return cube
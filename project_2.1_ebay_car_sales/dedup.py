@@ -0,0 +1,159 @@
+# Removal of listings that the crawler captured more than once. A listing is identified by the attributes that do not
+# change between crawls (DEDUP_COLUMNS), hashed to one 64-bit number per row; rows with the same hash are the same
+# listing and only the first one is kept.
+#
+# To recognise listings from earlier batches as well, the hashes that were kept are stored in an index directory. The
+# index is split into 2**SHARD_BITS shards by the top bits of the hash, and every shard is a list of sorted runs, one
+# .npy file each (as in an LSM tree). A batch is checked with a binary search in every memory-mapped run of the shards
+# it touches, and its new hashes are written as one new run per shard instead of rewriting the shards.
+# The newest two runs of a shard are merged while the older one is at most MERGE_RATIO times the size of the newer one;
+# the runs then shrink geometrically from old to new, so a shard has O(log n) runs and every hash is rewritten O(log n)
+# times in total. Memory use depends on the batch size and the size of one shard, not on the length of the history.
+#
+# The snapshot (snapshot.py) stores the hashes as the column HASH_COLUMN when it is built; drop_duplicates uses that
+# column if the frame has it, so the names need not be loaded to deduplicate.
+#
+# Two different listings get the same hash with a probability of about n**2 / 2**65 for n listings in total, i.e.
+# roughly one wrongly dropped listing in a history of a few billion.
+#
+# Usage:
+#   python dedup.py index_dir batch.csv [batch.csv ...]
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from ingest import read_autos
+
+DEDUP_COLUMNS = ["name", "postal_code", "ad_created", "price_dollar", "odometer_km"]
+HASH_COLUMN = "listing_hash"
+SHARD_BITS = 8
+MERGE_RATIO = 2
+
+
+def listing_hashes(autos):
+    # Integer columns are hashed as int64 and dates as seconds, so the hashes do not depend on the compact dtypes.
+    key = pd.DataFrame(
+        {
+            "name": autos["name"],
+            "postal_code": autos["postal_code"].astype(np.int64),
+            "ad_created": autos["ad_created"]
+            .to_numpy()
+            .astype("datetime64[s]")
+            .view(np.int64),
+            "price_dollar": autos["price_dollar"].astype(np.int64),
+            "odometer_km": autos["odometer_km"].astype(np.int64),
+        },
+        columns=DEDUP_COLUMNS,
+    )
+    return pd.util.hash_pandas_object(key, index=False).to_numpy()
+
+
+def first_occurrences(hashes):
+    keep = np.zeros(len(hashes), dtype=bool)
+    keep[np.unique(hashes, return_index=True)[1]] = True
+    return keep
+
+
+def run_path(directory, shard, number):
+    return os.path.join(
+        directory,
+        "{s:0{w}x}-{n:08d}.npy".format(s=shard, w=(SHARD_BITS + 3) // 4, n=number),
+    )
+
+
+def shards_of(hashes):
+    return (hashes >> np.uint64(64 - SHARD_BITS)).astype(np.int64)
+
+
+# The run numbers of every shard, oldest first.
+def list_runs(directory):
+    runs = {}
+    if not os.path.isdir(directory):
+        return runs
+    for entry in sorted(os.listdir(directory)):
+        shard, _, number = entry[: -len(".npy")].partition("-")
+        if entry.endswith(".npy") and number:
+            runs.setdefault(int(shard, 16), []).append(int(number))
+    return runs
+
+
+def read_run(directory, shard, number):
+    return np.load(run_path(directory, shard, number), mmap_mode="r")
+
+
+# Written to a temporary file first, so an interrupted run leaves no broken file behind.
+def save_run(directory, shard, number, hashes):
+    path = run_path(directory, shard, number)
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, hashes)
+    os.replace(path + ".tmp", path)
+
+
+def seen_before(directory, hashes):
+    seen = np.zeros(len(hashes), dtype=bool)
+    runs = list_runs(directory)
+    shards = shards_of(hashes)
+    for shard in np.unique(shards):
+        rows = np.flatnonzero(shards == shard)
+        for number in runs.get(shard, []):
+            known = read_run(directory, shard, number)
+            if len(known):
+                positions = np.searchsorted(known, hashes[rows])
+                positions[positions == len(known)] = 0
+                seen[rows] |= known[positions] == hashes[rows]
+    return seen
+
+
+# The merged run replaces the newer one before the older one is removed, so an interrupted merge leaves some hashes in
+# two runs, which is harmless.
+def merge_runs(directory, shard, numbers):
+    sizes = [len(read_run(directory, shard, number)) for number in numbers]
+    while len(numbers) > 1 and sizes[-2] <= MERGE_RATIO * sizes[-1]:
+        older, newer = numbers[-2:]
+        merged = np.union1d(
+            read_run(directory, shard, older), read_run(directory, shard, newer)
+        )
+        save_run(directory, shard, newer, merged)
+        os.remove(run_path(directory, shard, older))
+        del numbers[-2], sizes[-2]
+        sizes[-1] = len(merged)
+
+
+def add_hashes(directory, hashes):
+    os.makedirs(directory, exist_ok=True)
+    runs = list_runs(directory)
+    number = max((n for numbers in runs.values() for n in numbers), default=-1) + 1
+    shards = shards_of(hashes)
+    for shard in np.unique(shards):
+        save_run(directory, shard, number, np.unique(hashes[shards == shard]))
+        merge_runs(directory, shard, runs.get(shard, []) + [number])
+
+
+# Drops the repeated listings of a batch and, with an index directory, the listings of earlier batches; the listings
+# that are kept are added to the index.
+def drop_duplicates(autos, directory=None):
+    if HASH_COLUMN in autos:
+        hashes = autos[HASH_COLUMN].to_numpy()
+    else:
+        hashes = listing_hashes(autos)
+    keep = first_occurrences(hashes)
+    if directory is not None:
+        keep &= ~seen_before(directory, hashes)
+        add_hashes(directory, hashes[keep])
+    return autos[keep]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit("usage: python dedup.py index_dir batch.csv [batch.csv ...]")
+
+    directory = sys.argv[1]
+    for path in sys.argv[2:]:
+        autos = read_autos(path)
+        kept = drop_duplicates(autos, directory)
+        print(
+            "{p}: {k} of {n} listings are new".format(p=path, k=len(kept), n=len(autos))
+        )
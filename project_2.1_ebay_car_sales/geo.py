@@ -0,0 +1,225 @@
+# Where the listings are: "postal_code" joined to a local table of German postal codes with their place, federal state
+# and coordinates (e.g. an export of OpenGeoDB or GeoNames), which is read from POSTAL_CODES_FILE next to autos.csv.
+# The table is not part of the repository.
+#
+# The join does not use pd.merge: the table is sorted by postal code once, and every listing finds its row with a
+# binary search over the sorted integer codes (np.searchsorted), so joining is one vectorized pass over the listings.
+#
+# For comparisons with nearby listings the postal codes are put in a KD-tree on their coordinates (as points on the
+# unit sphere, so straight-line distances order the same way as distances over the surface). The prices are summed
+# per postal code first, so the tree only holds the postal codes that occur, not the listings.
+
+import numpy as np
+import pandas as pd
+
+POSTAL_CODES_FILE = "postal_codes.csv"
+POSTAL_CODE_COLUMNS = ["postal_code", "place", "region", "latitude", "longitude"]
+LEAF_SIZE = 32
+NEIGHBOURS = 10
+EARTH_RADIUS_KM = 6371.0
+
+
+def load_postal_codes(path):
+    table = pd.read_csv(
+        path,
+        usecols=POSTAL_CODE_COLUMNS,
+        dtype={
+            "postal_code": "int32",
+            "place": str,
+            "region": "category",
+            "latitude": "float64",
+            "longitude": "float64",
+        },
+    )
+    # A postal code can cover several places; the first one stands for all of them.
+    table = table.sort_values("postal_code", kind="stable")
+    return table.drop_duplicates("postal_code").reset_index(drop=True)
+
+
+# Row of every code in the table, or -1 for codes that are not in it.
+def locate(table, postal_codes):
+    codes = table["postal_code"].to_numpy()
+    postal_codes = np.asarray(postal_codes)
+    positions = np.searchsorted(codes, postal_codes)
+    positions[positions == len(codes)] = 0
+    return np.where(codes[positions] == postal_codes, positions, -1)
+
+
+def join_postal_codes(autos, table, columns=("region", "latitude", "longitude")):
+    positions = locate(table, autos["postal_code"])
+    found = positions >= 0
+    joined = autos.copy()
+    for column in columns:
+        values = table[column].iloc[np.where(found, positions, 0)]
+        joined[column] = values.where(found).to_numpy()
+        if isinstance(table[column].dtype, pd.CategoricalDtype):
+            joined[column] = pd.Categorical(
+                joined[column], categories=table[column].cat.categories
+            )
+    return joined
+
+
+def region_price_stats(autos, table, by="region"):
+    joined = join_postal_codes(autos, table, [by])
+    groups = joined.groupby(by, observed=True)["price_dollar"]
+    stats = groups.agg(["count", "mean", "median"])
+    stats.columns = ["listings", "mean_price_dollar", "median_price_dollar"]
+    return stats.sort_values("mean_price_dollar", ascending=False)
+
+
+def unit_vectors(latitude, longitude):
+    lat, lon = np.radians(latitude), np.radians(longitude)
+    return np.column_stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)]
+    )
+
+
+# The tree is kept in flat arrays: node i covers points order[start[i]:end[i]] inside the box lower[i]..upper[i], and
+# has children left[i] and right[i] (-1 for leaves). Points of the left child have a coordinate on axis[i] of at most
+# split[i], points of the right child at least split[i].
+def build_kdtree(points, leaf_size=LEAF_SIZE):
+    points = np.asarray(points, dtype=np.float64)
+    order = np.arange(len(points))
+    nodes = []
+
+    def build(start, end):
+        node = len(nodes)
+        box = points[order[start:end]]
+        nodes.append([start, end, box.min(axis=0), box.max(axis=0), -1, -1, 0, 0.0])
+        if end - start > leaf_size:
+            axis = int(np.argmax(nodes[node][3] - nodes[node][2]))
+            middle = (start + end) // 2
+            members = order[start:end]
+            split = np.argpartition(points[members, axis], middle - start)
+            order[start:end] = members[split]
+            nodes[node][6] = axis
+            nodes[node][7] = points[order[middle], axis]
+            nodes[node][4] = build(start, middle)
+            nodes[node][5] = build(middle, end)
+        return node
+
+    if len(points):
+        build(0, len(points))
+    return {
+        "points": points,
+        "order": order,
+        "start": np.array([node[0] for node in nodes], dtype=np.int64),
+        "end": np.array([node[1] for node in nodes], dtype=np.int64),
+        "lower": np.array([node[2] for node in nodes]),
+        "upper": np.array([node[3] for node in nodes]),
+        "left": np.array([node[4] for node in nodes], dtype=np.int64),
+        "right": np.array([node[5] for node in nodes], dtype=np.int64),
+        "axis": np.array([node[6] for node in nodes], dtype=np.int64),
+        "split": np.array([node[7] for node in nodes]),
+    }
+
+
+# Squared distances between the box lower..upper and the boxes of the given nodes.
+def box_distances(tree, nodes, lower, upper):
+    gaps = np.maximum(tree["lower"][nodes] - upper, 0) + np.maximum(
+        lower - tree["upper"][nodes], 0
+    )
+    return np.einsum("ij,ij->i", gaps, gaps)
+
+
+# Indices and squared distances of the k points nearest to every query point, nearest first. The queries are grouped
+# by the leaves of a tree of their own and every group is searched at once, in two steps. First the tree is descended
+# towards the centre of the group's box as long as the node holds at least k points; its points give every query k
+# candidates, and the largest k-th distance among them is an upper bound. Then the tree is walked level by level,
+# keeping only the nodes whose box is not farther than that bound from the group's box, and the leaves that are left
+# hold the answer.
+def query_kdtree(tree, queries, k=NEIGHBOURS):
+    queries = np.asarray(queries, dtype=np.float64)
+    k = min(k, len(tree["points"]))
+    indices = np.zeros((len(queries), k), dtype=np.int64)
+    distances = np.zeros((len(queries), k))
+    if not k or not len(queries):
+        return indices, distances
+
+    left, right = tree["left"], tree["right"]
+    sizes = (tree["end"] - tree["start"]).tolist()
+    axes, splits = tree["axis"].tolist(), tree["split"].tolist()
+    groups = build_kdtree(queries)
+
+    def nearest(points, nodes):
+        members = np.concatenate(
+            [tree["order"][tree["start"][node] : tree["end"][node]] for node in nodes]
+        )
+        offsets = points[:, None, :] - tree["points"][members][None, :, :]
+        squared = np.einsum("ijk,ijk->ij", offsets, offsets)
+        keep = np.argpartition(squared, k - 1, axis=1)[:, :k]
+        rows = np.arange(len(points))[:, None]
+        keep = keep[rows, np.argsort(squared[rows, keep], axis=1, kind="stable")]
+        return members[keep], squared[rows, keep]
+
+    for group in np.flatnonzero(groups["left"] < 0):
+        rows = groups["order"][groups["start"][group] : groups["end"][group]]
+        lower, upper = groups["lower"][group], groups["upper"][group]
+
+        node = 0
+        centre = ((lower + upper) / 2).tolist()
+        while left[node] >= 0:
+            below = centre[axes[node]] <= splits[node]
+            child = left[node] if below else right[node]
+            if sizes[child] < k:
+                break
+            node = child
+        _, candidate = nearest(queries[rows], [node])
+        bound = candidate[:, -1].max()
+
+        frontier = np.array([0])
+        found = []
+        while len(frontier):
+            is_leaf = left[frontier] < 0
+            found.append(frontier[is_leaf])
+            inner = frontier[~is_leaf]
+            frontier = np.concatenate([left[inner], right[inner]])
+            frontier = frontier[box_distances(tree, frontier, lower, upper) <= bound]
+        indices[rows], distances[rows] = nearest(queries[rows], np.concatenate(found))
+    return indices, distances
+
+
+def chord_to_km(squared_chords):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.sqrt(squared_chords) / 2, 1))
+
+
+# Compares the price of every listing with the listings of the k postal codes nearest to its own (including its own).
+# Returns the mean price of that neighbourhood, its number of listings and its radius in km, with NaN for listings
+# whose postal code is not in the table.
+def neighbour_prices(autos, table, k=NEIGHBOURS):
+    positions = locate(table, autos["postal_code"])
+    found = positions >= 0
+    prices = autos["price_dollar"].to_numpy()
+
+    counts = np.bincount(positions[found], minlength=len(table))
+    sums = np.bincount(positions[found], weights=prices[found], minlength=len(table))
+    occupied = np.flatnonzero(counts)
+    points = unit_vectors(
+        table["latitude"].to_numpy()[occupied], table["longitude"].to_numpy()[occupied]
+    )
+    tree = build_kdtree(points)
+    neighbours, distances = query_kdtree(tree, points, k)
+
+    # Per occupied postal code, then spread to the listings.
+    neighbour_counts = counts[occupied][neighbours].sum(axis=1)
+    neighbour_means = sums[occupied][neighbours].sum(axis=1) / neighbour_counts
+    radius = chord_to_km(distances[:, -1]) if neighbours.size else np.zeros(0)
+
+    slot = np.full(len(table), -1)
+    slot[occupied] = np.arange(len(occupied))
+    rows = np.where(found, slot[np.where(found, positions, 0)], -1)
+
+    # Listings without a postal code in the table (row -1) get the NaN at the end.
+    def spread(values):
+        return np.append(np.asarray(values, dtype=np.float64), np.nan)[rows]
+
+    result = pd.DataFrame(
+        {
+            "neighbour_mean_price_dollar": spread(neighbour_means),
+            "neighbour_listings": spread(neighbour_counts),
+            "neighbour_radius_km": spread(radius),
+        },
+        index=autos.index,
+    )
+    result["price_vs_neighbours"] = prices / result["neighbour_mean_price_dollar"]
+    return result
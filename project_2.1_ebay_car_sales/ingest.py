@@ -0,0 +1,232 @@
+# Chunked, typed ingestion of the eBay autos data. The raw CSV is read a chunk at a time; every chunk is renamed,
+# cleaned and filtered as in Main.py and converted to compact dtypes before the next one is read, so peak memory is
+# proportional to the cleaned output instead of the raw file.
+
+import pandas as pd
+
+from numeric import parse_int, DEFAULT_PREFIXES, DEFAULT_SUFFIXES
+from outliers import (
+    range_rule,
+    needs_statistics,
+    rule_columns,
+    new_state,
+    update_state,
+    thresholds,
+    outlier_mask,
+)
+
+COLUMNS = [
+    "date_crawled",
+    "name",
+    "seller",
+    "offer_type",
+    "price",
+    "abtest",
+    "vehicle_type",
+    "registration_year",
+    "gearbox",
+    "power_ps",
+    "model",
+    "odometer",
+    "registration_month",
+    "fuel_type",
+    "brand",
+    "unrepaired_damage",
+    "ad_created",
+    "nr_of_pictures",
+    "postal_code",
+    "last_seen",
+]
+
+# "seller", "offer_type" and "nr_of_pictures" are mostly one value and are never read.
+DROPPED_COLUMNS = ["seller", "offer_type", "nr_of_pictures"]
+
+# String columns that are read as categories if they have few distinct values (see category_columns).
+TEXT_COLUMNS = [
+    "name",
+    "abtest",
+    "vehicle_type",
+    "gearbox",
+    "model",
+    "fuel_type",
+    "brand",
+    "unrepaired_damage",
+]
+SAMPLE_ROWS = 100000
+MAX_CATEGORY_RATIO = 0.05
+DATE_COLUMNS = ["date_crawled", "ad_created", "last_seen"]
+DATE_FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d.%m.%Y %H:%M:%S", "%d.%m.%Y"]
+
+RAW_DTYPES = {
+    "date_crawled": str,
+    "name": str,
+    "price": str,
+    "registration_year": "int32",
+    "power_ps": "int32",
+    "odometer": str,
+    "registration_month": "int32",
+    "ad_created": str,
+    "postal_code": "int32",
+    "last_seen": str,
+}
+RAW_DTYPES.update({column: str for column in TEXT_COLUMNS})
+
+CLEAN_DTYPES = {
+    "price_dollar": "int32",
+    "odometer_km": "int32",
+    "registration_year": "int16",
+    "power_ps": "int16",
+    "registration_month": "int8",
+    "postal_code": "int32",
+}
+
+RENAMED_COLUMNS = {"price": "price_dollar", "odometer": "odometer_km"}
+
+# The listings that are kept (see outliers.py for the other kinds of rules).
+PRICE_RANGE = (1, 350001)
+REGISTRATION_YEAR_RANGE = (1900, 2016)
+OUTLIER_RULES = [
+    range_rule("price_dollar", *PRICE_RANGE),
+    range_rule("registration_year", *REGISTRATION_YEAR_RANGE),
+]
+CHUNK_ROWS = 500000
+
+# Increase this when clean_chunk changes in a way that gives a different frame, so snapshots of the old frame are
+# rebuilt (see snapshot.py). Changes to the constants above (except CHUNK_ROWS, which does not change the frame) and to
+# the formats parse_int accepts are noticed without it, because cleaning_rules holds all of them.
+CLEANING_VERSION = 1
+
+
+def cleaning_rules():
+    return {
+        "version": CLEANING_VERSION,
+        "columns": COLUMNS,
+        "dropped_columns": DROPPED_COLUMNS,
+        "text_columns": TEXT_COLUMNS,
+        "sample_rows": SAMPLE_ROWS,
+        "max_category_ratio": MAX_CATEGORY_RATIO,
+        "date_columns": DATE_COLUMNS,
+        "date_formats": DATE_FORMATS,
+        # str is stored by its name.
+        "raw_dtypes": {
+            column: getattr(dtype, "__name__", dtype)
+            for column, dtype in RAW_DTYPES.items()
+        },
+        "clean_dtypes": CLEAN_DTYPES,
+        "renamed_columns": RENAMED_COLUMNS,
+        "number_prefixes": DEFAULT_PREFIXES,
+        "number_suffixes": DEFAULT_SUFFIXES,
+        "outlier_rules": OUTLIER_RULES,
+    }
+
+
+# The dates in the crawl all have the first format, which pandas parses in C (and only once per distinct value). Only
+# the values that do not match it are tried with the other formats; values that match none of them become NaT.
+def parse_dates(values, formats=DATE_FORMATS):
+    parsed = pd.to_datetime(values, format=formats[0], errors="coerce")
+    for format in formats[1:]:
+        other = parsed.isna() & values.notna()
+        if not other.any():
+            break
+        parsed[other] = pd.to_datetime(values[other], format=format, errors="coerce")
+    return parsed
+
+
+# Parses price and odometer and gives them their new names; the chunk may contain only some of the columns.
+def prepare_chunk(chunk):
+    for column in RENAMED_COLUMNS:
+        if column in chunk:
+            chunk[column] = parse_int(chunk[column])
+    return chunk.rename(columns=RENAMED_COLUMNS)
+
+
+def clean_chunk(chunk, limits):
+    chunk = prepare_chunk(chunk)
+    chunk = chunk[outlier_mask(chunk, limits)].astype(CLEAN_DTYPES)
+
+    for column in DATE_COLUMNS:
+        chunk[column] = parse_dates(chunk[column])
+    # Values that only occurred in filtered rows are no longer categories.
+    for column in chunk.columns:
+        if isinstance(chunk[column].dtype, pd.CategoricalDtype):
+            chunk[column] = chunk[column].cat.remove_unused_categories()
+    return chunk
+
+
+# Chunks have their own categories, which pd.concat would turn back into strings, so they get the union first.
+def concat_chunks(chunks):
+    for column in chunks[0].columns:
+        if not isinstance(chunks[0][column].dtype, pd.CategoricalDtype):
+            continue
+        categories = sorted(
+            set().union(*(chunk[column].cat.categories for chunk in chunks))
+        )
+        for chunk in chunks:
+            chunk[column] = chunk[column].cat.set_categories(categories)
+    return pd.concat(chunks)
+
+
+def read_chunks(path, chunksize=CHUNK_ROWS, usecols=None, categories=()):
+    if usecols is None:
+        usecols = [column for column in COLUMNS if column not in DROPPED_COLUMNS]
+    return pd.read_csv(
+        path,
+        encoding="Latin-1",
+        header=0,
+        names=COLUMNS,
+        usecols=usecols,
+        dtype={
+            column: "category" if column in categories else RAW_DTYPES[column]
+            for column in usecols
+        },
+        chunksize=chunksize,
+    )
+
+
+# A string column is read as a category, i.e. as integer codes into one array of its distinct values, if the first
+# sample_rows rows have at most max_ratio distinct values per value. Columns like "brand" and "gearbox" qualify, "name"
+# does not.
+def category_columns(path, sample_rows=SAMPLE_ROWS, max_ratio=MAX_CATEGORY_RATIO):
+    sample = pd.read_csv(
+        path,
+        encoding="Latin-1",
+        header=0,
+        names=COLUMNS,
+        usecols=TEXT_COLUMNS,
+        dtype=str,
+        nrows=sample_rows,
+    )
+    columns = []
+    for column in TEXT_COLUMNS:
+        values = sample[column].dropna()
+        if values.nunique() <= max_ratio * len(values):
+            columns.append(column)
+    return columns
+
+
+# Rules that depend on the data need a pre-pass over the columns they use; range rules are returned as they are.
+def outlier_thresholds(path, rules=OUTLIER_RULES, chunksize=CHUNK_ROWS):
+    state = new_state(rules)
+    if needs_statistics(rules):
+        raw_names = {new: old for old, new in RENAMED_COLUMNS.items()}
+        usecols = [raw_names.get(column, column) for column in rule_columns(rules)]
+        for chunk in read_chunks(path, chunksize, usecols):
+            update_state(state, rules, prepare_chunk(chunk))
+    return thresholds(rules, state)
+
+
+# The thresholds that were applied are kept in autos.attrs["outlier_thresholds"]. The string columns to read as
+# categories are found with category_columns, unless they are given.
+def read_autos(path, chunksize=CHUNK_ROWS, rules=OUTLIER_RULES, categories=None):
+    if categories is None:
+        categories = category_columns(path)
+    limits = outlier_thresholds(path, rules, chunksize)
+    chunks = [
+        clean_chunk(chunk, limits)
+        for chunk in read_chunks(path, chunksize, categories=categories)
+    ]
+    if not chunks:
+        raise ValueError("{} contains no listings".format(path))
+    autos = concat_chunks(chunks)
+    autos.attrs["outlier_thresholds"] = limits
+    return autos
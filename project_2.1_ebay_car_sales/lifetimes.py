@@ -0,0 +1,42 @@
+# How long listings stay online: the time between "ad_created" and "last_seen", in days. Both columns are datetime64
+# after reading (see parse_dates in ingest.py), so the lifetimes are one subtraction over the whole frame and the
+# statistics one grouped aggregation, per brand, model, price band or any combination of these.
+#
+# A listing that was still online during the last crawl has a lifetime that is only a lower bound. Such listings are
+# not left out, so the statistics of recent listings are biased downwards.
+
+import numpy as np
+import pandas as pd
+
+from ingest import PRICE_RANGE
+
+# Upper bounds (exclusive) of the price bands in dollars; the last band ends at the upper bound of the price rule in
+# ingest.py, which keeps that price itself.
+PRICE_BANDS = [1000, 2500, 5000, 10000, 20000, 50000, PRICE_RANGE[1] + 1]
+
+
+def listing_lifetimes(autos):
+    lifetimes = (autos["last_seen"] - autos["ad_created"]) / pd.Timedelta(days=1)
+    # A listing that was last seen before it was created is a data error.
+    return lifetimes.where(lifetimes >= 0).rename("lifetime_days")
+
+
+def price_bands(prices, bands=PRICE_BANDS):
+    edges = [0] + list(bands)
+    labels = ["{}-{}".format(low, high - 1) for low, high in zip(edges[:-1], edges[1:])]
+    return pd.cut(prices, edges, labels=labels, right=False).rename("price_band")
+
+
+# `by` is a column name or a list of them; "price_band" groups by the bands above.
+def lifetime_summary(autos, by="brand", bands=PRICE_BANDS):
+    by = [by] if isinstance(by, str) else list(by)
+    keys = [
+        price_bands(autos["price_dollar"], bands) if key == "price_band" else autos[key]
+        for key in by
+    ]
+
+    groups = listing_lifetimes(autos).groupby(keys, observed=True)
+    summary = groups.agg(["count", "mean", "median"])
+    summary.columns = ["listings", "mean_lifetime_days", "median_lifetime_days"]
+    summary["p90_lifetime_days"] = groups.quantile(0.9)
+    return summary.astype({"listings": np.int64})
@@ -0,0 +1,159 @@
+# Parsing of numbers stored as text, like "$5,000" and "150,000km". The chain of str.replace calls followed by
+# astype(int) creates a new array of strings for every replace. Here the strings are viewed as a matrix of code points
+# and the digits are accumulated column by column, while a table of state transitions checks the format of every value
+# at the same time. The text is only read once and no intermediate strings are made.
+#
+# A value is read as: spaces, at most one currency sign (`prefixes`), an optional minus sign, the digits with commas
+# only as thousands separators (groups of three digits, e.g. "5,000" but not "5,00" or "1,2,3"), spaces and at most one
+# unit (`suffixes`) as a whole trailing token, e.g. "150,000km" or "150,000 km". Anything else is malformed, e.g. "5k"
+# or "k1m", as is a value that is missing, contains no digits or has more digits than fit in an int64. With
+# errors="raise" a malformed value raises a ValueError naming the first few of them; with errors="coerce" it becomes
+# <NA> and the result has the nullable Int64 dtype.
+#
+# The function does not depend on anything in this project, so it can be used for the "number stored as text" columns
+# of the other projects as well, e.g. parse_int(data["sat_results"]["SAT Math Avg. Score"], errors="coerce").
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PREFIXES = "$€"
+DEFAULT_SUFFIXES = ("km",)
+MAX_DIGITS = 18
+
+# Every character is looked up in a table of classes; characters past the end of the table are OTHER (its last entry). END stands for
+# the columns after the number (padding, trailing spaces and the suffix).
+OTHER, SPACE, PREFIX, DIGIT, MINUS, COMMA, END = range(7)
+
+# The states of the scan of a value: before the number (and after its currency sign), after the minus sign, in the
+# first group of digits with 1, 2, 3 or more digits, after a comma with 0 to 3 digits of the next group, after the
+# number, and malformed.
+(
+    BEFORE,
+    PREFIXED,
+    SIGN,
+    FIRST_1,
+    FIRST_2,
+    FIRST_3,
+    FIRST_LONG,
+    GROUP_0,
+    GROUP_1,
+    GROUP_2,
+    GROUP_3,
+    AFTER,
+    MALFORMED,
+) = range(13)
+COMPLETE = [FIRST_1, FIRST_2, FIRST_3, FIRST_LONG, GROUP_3, AFTER]
+
+
+# The next state for every state and character class; everything not listed is malformed.
+def state_transitions():
+    table = np.full((MALFORMED + 1, END + 1), MALFORMED, dtype=np.uint8)
+    table[:, END] = np.arange(MALFORMED + 1)
+    for state, kind, target in [
+        (BEFORE, SPACE, BEFORE),
+        (BEFORE, PREFIX, PREFIXED),
+        (BEFORE, MINUS, SIGN),
+        (BEFORE, DIGIT, FIRST_1),
+        (PREFIXED, SPACE, PREFIXED),
+        (PREFIXED, MINUS, SIGN),
+        (PREFIXED, DIGIT, FIRST_1),
+        (SIGN, DIGIT, FIRST_1),
+        (FIRST_1, DIGIT, FIRST_2),
+        (FIRST_2, DIGIT, FIRST_3),
+        (FIRST_3, DIGIT, FIRST_LONG),
+        (FIRST_LONG, DIGIT, FIRST_LONG),
+        (GROUP_0, DIGIT, GROUP_1),
+        (GROUP_1, DIGIT, GROUP_2),
+        (GROUP_2, DIGIT, GROUP_3),
+        (AFTER, SPACE, AFTER),
+    ]:
+        table[state, kind] = target
+    for state in [FIRST_1, FIRST_2, FIRST_3, GROUP_3]:
+        table[state, COMMA] = GROUP_0
+    for state in [FIRST_1, FIRST_2, FIRST_3, FIRST_LONG, GROUP_3]:
+        table[state, SPACE] = AFTER
+    return table
+
+
+TRANSITIONS = state_transitions()
+
+
+def char_classes(prefixes):
+    table = np.full(max(ord(c) for c in "9-, " + prefixes) + 2, OTHER, dtype=np.uint8)
+    table[ord(" ")] = SPACE
+    for c in prefixes:
+        table[ord(c)] = PREFIX
+    table[ord("0") : ord("9") + 1] = DIGIT
+    table[ord("-")] = MINUS
+    table[ord(",")] = COMMA
+    return table
+
+
+# The end of the number in every row: the length of the text without its trailing spaces and without one of the
+# suffixes, if the text ends with it. `chars` holds the code points of the texts as columns.
+def number_ends(text, chars, suffixes):
+    rows = np.arange(len(text))
+    ends = np.char.str_len(text)
+    while True:
+        trailing = (ends > 0) & (chars[np.maximum(ends - 1, 0), rows] == ord(" "))
+        if not trailing.any():
+            break
+        ends -= trailing
+    lengths = ends.copy()
+    for suffix in suffixes:
+        start = lengths - len(suffix)
+        match = (start >= 0) & (ends == lengths)
+        for k, c in enumerate(suffix):
+            match &= chars[np.maximum(start + k, 0), rows] == ord(c)
+        ends = np.where(match, start, ends)
+    return ends
+
+
+def parse_int(
+    values, prefixes=DEFAULT_PREFIXES, suffixes=DEFAULT_SUFFIXES, errors="raise"
+):
+    if errors not in ("raise", "coerce"):
+        raise ValueError("errors must be 'raise' or 'coerce', not {!r}".format(errors))
+
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    missing = series.isna().to_numpy()
+    text = np.asarray(series.where(~missing, ""), dtype=str)
+
+    n = len(text)
+    width = text.dtype.itemsize // 4
+    result = np.zeros(n, dtype=np.int64)
+    digits = np.zeros(n, dtype=np.int64)
+    negative = np.zeros(n, dtype=bool)
+    state = np.full(n, BEFORE, dtype=np.intp)
+
+    if n and width:
+        # One row per character position, so every step of the scan reads contiguous memory.
+        chars = np.ascontiguousarray(text.view(np.uint32).reshape(n, width).T)
+        kinds = np.take(char_classes(prefixes), chars, mode="clip")
+        kinds[np.arange(width)[:, None] >= number_ends(text, chars, suffixes)] = END
+        transitions = TRANSITIONS.ravel()
+        for j in range(width):
+            state = np.take(transitions, state * (END + 1) + kinds[j])
+            is_digit = kinds[j] == DIGIT
+            result = np.where(is_digit, result * 10 + (chars[j] - ord("0")), result)
+            digits += is_digit
+        negative = (kinds == MINUS).any(axis=0)
+
+    malformed = missing | ~np.isin(state, COMPLETE) | (digits > MAX_DIGITS)
+    result = np.where(negative, -result, result)
+
+    if errors == "raise":
+        if malformed.any():
+            examples = series[malformed].head(5).tolist()
+            raise ValueError(
+                "{n} values cannot be parsed as integers, e.g. {e}".format(
+                    n=int(malformed.sum()), e=examples
+                )
+            )
+        return pd.Series(result, index=series.index, name=series.name)
+
+    return pd.Series(
+        pd.arrays.IntegerArray(result, malformed),
+        index=series.index,
+        name=series.name,
+    )
@@ -0,0 +1,240 @@
+# Outlier rules for the autos data. A rule is a dict naming a column and a method:
+#
+#   {"column": "price_dollar", "method": "range", "low": 1, "high": 350001}
+#       keeps the values between low and high (inclusive), like Series.between;
+#   {"column": "price_dollar", "method": "iqr", "k": 1.5}
+#       keeps the values within k interquartile ranges of the quartiles;
+#   {"column": "price_dollar", "method": "mad", "k": 3.5}
+#       keeps the values whose robust z-score, 0.6745 * (x - median) / MAD, is at most k in absolute value;
+#   {"column": "price_dollar", "method": "quantile", "low": 0.001, "high": 0.999}
+#       keeps the values between these quantiles.
+#
+# The last three take an optional "by" column (e.g. "by": "brand"), which gives every group its own thresholds.
+#
+# Their thresholds depend on the whole column, so they are computed in a pre-pass over the data that only keeps a
+# sketch per column and group: a histogram with logarithmically growing buckets, so every value is within a relative
+# error of "accuracy" (default ACCURACY) of the bucket it is counted in. The sketches need memory in proportion to the
+# number of occupied buckets, not the number of values, can be merged, and do not depend on the order of the values,
+# so the same data always gives the same thresholds. The thresholds are then applied to every chunk with a
+# vectorized comparison.
+
+import math
+
+import numpy as np
+import pandas as pd
+
+ACCURACY = 0.0001
+IQR_K = 1.5
+MAD_K = 3.5
+
+
+def range_rule(column, low, high):
+    return {"column": column, "method": "range", "low": low, "high": high}
+
+
+def needs_statistics(rules):
+    return any(rule["method"] != "range" for rule in rules)
+
+
+def rule_columns(rules):
+    columns = []
+    for rule in rules:
+        for column in [rule["column"], rule.get("by")]:
+            if column is not None and column not in columns:
+                columns.append(column)
+    return columns
+
+
+def new_sketch(accuracy=ACCURACY):
+    return {"accuracy": accuracy, "zero": 0, "positive": {}, "negative": {}}
+
+
+def bucket_gamma(sketch):
+    return (1 + sketch["accuracy"]) / (1 - sketch["accuracy"])
+
+
+def add_buckets(buckets, indices):
+    indices, counts = np.unique(indices, return_counts=True)
+    for index, count in zip(indices.tolist(), counts.tolist()):
+        buckets[index] = buckets.get(index, 0) + count
+
+
+def update_sketch(sketch, values):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    log_gamma = math.log(bucket_gamma(sketch))
+    sketch["zero"] += int((values == 0).sum())
+    for sign, key in [(1, "positive"), (-1, "negative")]:
+        magnitudes = values[sign * values > 0] * sign
+        indices = np.ceil(np.log(magnitudes) / log_gamma).astype(np.int64)
+        add_buckets(sketch[key], indices)
+    return sketch
+
+
+def merge_sketches(a, b):
+    merged = new_sketch(a["accuracy"])
+    merged["zero"] = a["zero"] + b["zero"]
+    for key in ["positive", "negative"]:
+        for sketch in [a, b]:
+            for index, count in sketch[key].items():
+                merged[key][index] = merged[key].get(index, 0) + count
+    return merged
+
+
+# The buckets as sorted representative values and their counts. With edges=True also the lower and upper edges of
+# every bucket: positive bucket i holds the values in (gamma^(i-1), gamma^i], negative bucket i the values in
+# [-gamma^i, -gamma^(i-1)).
+def sketch_points(sketch, edges=False):
+    gamma = bucket_gamma(sketch)
+
+    def representatives(buckets, sign):
+        indices = np.array(sorted(buckets), dtype=np.float64)
+        counts = np.array([buckets[i] for i in sorted(buckets)], dtype=np.int64)
+        bounds = sign * gamma ** (indices - 1), sign * gamma**indices
+        return sign * 2 * gamma**indices / (gamma + 1), counts, bounds
+
+    negative, negative_counts, (negative_inner, negative_outer) = representatives(
+        sketch["negative"], -1
+    )
+    positive, positive_counts, (positive_lower, positive_upper) = representatives(
+        sketch["positive"], 1
+    )
+    values = np.concatenate([negative[::-1], [0.0], positive])
+    counts = np.concatenate([negative_counts[::-1], [sketch["zero"]], positive_counts])
+    if not edges:
+        return values, counts
+    lower = np.concatenate([negative_outer[::-1], [0.0], positive_lower])
+    upper = np.concatenate([negative_inner[::-1], [0.0], positive_upper])
+    return values, counts, lower, upper
+
+
+def weighted_quantile(values, counts, q):
+    order = np.argsort(values, kind="stable")
+    values, cumulative = values[order], np.cumsum(counts[order])
+    if not len(cumulative) or cumulative[-1] == 0:
+        return math.nan
+    rank = q * (cumulative[-1] - 1)
+    return float(values[np.searchsorted(cumulative, rank, side="right")])
+
+
+# The lower and upper edge of the bucket that holds quantile q.
+def sketch_quantile(sketch, q):
+    values, counts, lower, upper = sketch_points(sketch, edges=True)
+    cumulative = np.cumsum(counts)
+    if cumulative[-1] == 0:
+        return math.nan, math.nan
+    position = np.searchsorted(cumulative, q * (cumulative[-1] - 1), side="right")
+    return float(lower[position]), float(upper[position])
+
+
+def sketch_mad(sketch):
+    values, counts = sketch_points(sketch)
+    median = weighted_quantile(values, counts, 0.5)
+    return weighted_quantile(np.abs(values - median), counts, 0.5)
+
+
+# A threshold taken from a quantile is the outer edge of its bucket (the lower edge for low thresholds, the upper edge
+# for high ones), so it never falls between values of the same bucket: a threshold at a common value (e.g. 150000 km)
+# keeps all listings with that value.
+def rule_thresholds(rule, sketch):
+    method = rule["method"]
+    if method == "iqr":
+        k = rule.get("k", IQR_K)
+        q1, q3 = sketch_quantile(sketch, 0.25)[0], sketch_quantile(sketch, 0.75)[1]
+        return q1 - k * (q3 - q1), q3 + k * (q3 - q1)
+    if method == "mad":
+        k = rule.get("k", MAD_K)
+        (low, high), mad = sketch_quantile(sketch, 0.5), sketch_mad(sketch)
+        return low - k * mad / 0.6745, high + k * mad / 0.6745
+    if method == "quantile":
+        return (
+            sketch_quantile(sketch, rule["low"])[0],
+            sketch_quantile(sketch, rule["high"])[1],
+        )
+    raise ValueError("unknown outlier method {!r}".format(method))
+
+
+# The sketches of all rules that need statistics, as a list with one entry per rule: None for range rules, a sketch
+# for rules without "by" and a dict of sketches per group otherwise.
+def new_state(rules):
+    return [
+        (
+            None
+            if rule["method"] == "range"
+            else ({} if rule.get("by") else new_sketch(rule.get("accuracy", ACCURACY)))
+        )
+        for rule in rules
+    ]
+
+
+def update_state(state, rules, chunk):
+    for rule, sketches in zip(rules, state):
+        if sketches is None:
+            continue
+        values = chunk[rule["column"]]
+        if not rule.get("by"):
+            update_sketch(sketches, values)
+            continue
+        for group, group_values in values.groupby(chunk[rule["by"]], observed=True):
+            sketch = sketches.setdefault(
+                group, new_sketch(rule.get("accuracy", ACCURACY))
+            )
+            update_sketch(sketch, group_values)
+    return state
+
+
+# One dict per rule with the column and "low" and "high", or with "by" and the thresholds per group.
+def thresholds(rules, state):
+    result = []
+    for rule, sketches in zip(rules, state):
+        entry = {"column": rule["column"], "method": rule["method"]}
+        if sketches is None:
+            entry.update(low=rule["low"], high=rule["high"])
+        elif not rule.get("by"):
+            entry["low"], entry["high"] = rule_thresholds(rule, sketches)
+        else:
+            entry["by"] = rule["by"]
+            entry["groups"] = {
+                group: rule_thresholds(rule, sketch)
+                for group, sketch in sorted(sketches.items())
+            }
+        result.append(entry)
+    return result
+
+
+# Rows of groups that have no thresholds (they did not occur in the pre-pass) are kept.
+def outlier_mask(chunk, limits):
+    keep = pd.Series(True, index=chunk.index)
+    for entry in limits:
+        values = chunk[entry["column"]]
+        if "groups" not in entry:
+            keep &= values.between(entry["low"], entry["high"])
+            continue
+        groups = chunk[entry["by"]].astype(object)
+        low = groups.map({g: t[0] for g, t in entry["groups"].items()})
+        high = groups.map({g: t[1] for g, t in entry["groups"].items()})
+        keep &= ~((values < low) | (values > high))
+    return keep
+
+
+# Checks that a quantile rule from 0 to 1 keeps every row, also when most rows share a few values and per group.
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    rows = 100000
+    chunk = pd.DataFrame(
+        {
+            "odometer_km": np.where(
+                rng.random(rows) < 0.65,
+                150000,
+                rng.choice([-20, 0, 5000, 125000], rows) * rng.lognormal(0, 0.1, rows),
+            ),
+            "brand": rng.choice(["audi", "bmw", "opel"], rows),
+        }
+    )
+    for by in [None, "brand"]:
+        rule = {"column": "odometer_km", "method": "quantile", "low": 0.0, "high": 1.0}
+        rules = [dict(rule, by=by) if by else rule]
+        state = update_state(new_state(rules), rules, chunk)
+        kept = int(outlier_mask(chunk, thresholds(rules, state)).sum())
+        print("by {}: kept {} of {} rows".format(by, kept, rows))
+        assert kept == rows
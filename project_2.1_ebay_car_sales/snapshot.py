@@ -0,0 +1,209 @@
+# Columnar snapshot of the cleaned autos frame. The first load reads and cleans the CSV with read_autos and writes every
+# column to its own .npy file in a directory next to the CSV: numbers and dates as they are, categories as their codes
+# (the categories go into meta.json) and the names as one UTF-8 buffer plus an array of offsets into it. Later loads
+# memory-map these files, so neither the CSV parsing nor the cleaning is repeated.
+#
+# The hashes that identify a listing for dedup.py (listing_hashes) are computed from the names while they are in memory
+# anyway and stored as one more uint64 column, HASH_COLUMN. It is only loaded when it is asked for by name, so a full
+# load gives the same frame as read_autos.
+#
+# The snapshot stores the SHA-256 hash, size and mtime of the CSV and the cleaning rules (cleaning_rules in ingest.py)
+# it was built with. If the rules differ it is rebuilt. If the size or mtime differ the hash is computed again: a CSV
+# that was only touched or copied keeps its snapshot, any other change rebuilds it.
+#
+# Usage:
+#   python snapshot.py [path/to/autos.csv] [--rebuild]
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from dedup import HASH_COLUMN, DEDUP_COLUMNS, listing_hashes
+from ingest import read_autos, cleaning_rules
+
+SNAPSHOT_VERSION = 3
+
+
+def snapshot_dir(path):
+    return path + ".snapshot"
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 24), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_info(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def read_meta(directory):
+    meta_path = os.path.join(directory, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_meta(directory, meta):
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def snapshot_is_valid(path, directory, meta):
+    if meta is None or meta["version"] != SNAPSHOT_VERSION:
+        return False
+    # Round trip through JSON, so tuples and lists compare equal.
+    if meta["rules"] != json.loads(json.dumps(cleaning_rules())):
+        return False
+    if meta["dedup_columns"] != DEDUP_COLUMNS:
+        return False
+    info = source_info(path)
+    if info["size"] == meta["size"] and info["mtime"] == meta["mtime"]:
+        return True
+    if info["size"] != meta["size"] or file_hash(path) != meta["hash"]:
+        return False
+    meta.update(info)
+    write_meta(directory, meta)
+    return True
+
+
+def column_kind(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return "category"
+    if pd.api.types.is_string_dtype(series.dtype):
+        return "text"
+    return "array"
+
+
+def write_column(directory, name, series):
+    kind = column_kind(series)
+    entry = {"name": name, "kind": kind}
+    if kind == "category":
+        entry["categories"] = series.cat.categories.tolist()
+        np.save(os.path.join(directory, name + ".npy"), series.cat.codes.to_numpy())
+    elif kind == "text":
+        # Offsets count characters, so the decoded buffer can be sliced directly.
+        missing = series.isna().to_numpy()
+        values = series.fillna("").tolist()
+        lengths = np.array([len(value) for value in values], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        np.save(os.path.join(directory, name + ".offsets.npy"), offsets)
+        np.save(os.path.join(directory, name + ".missing.npy"), missing)
+        with open(os.path.join(directory, name + ".bin"), "wb") as f:
+            f.write("".join(values).encode("utf-8"))
+    else:
+        np.save(os.path.join(directory, name + ".npy"), series.to_numpy())
+    return entry
+
+
+def read_column(directory, entry):
+    name = entry["name"]
+    if entry["kind"] == "category":
+        codes = np.load(os.path.join(directory, name + ".npy"), mmap_mode="r")
+        return pd.Categorical.from_codes(codes, entry["categories"])
+    if entry["kind"] == "text":
+        offsets = np.load(os.path.join(directory, name + ".offsets.npy")).tolist()
+        with open(os.path.join(directory, name + ".bin"), "rb") as f:
+            text = f.read().decode("utf-8")
+        values = pd.array(
+            [text[start:end] for start, end in zip(offsets[:-1], offsets[1:])],
+            dtype="str",
+        )
+        missing = np.load(os.path.join(directory, name + ".missing.npy"))
+        if missing.any():
+            values[missing] = None
+        return values
+    return np.load(os.path.join(directory, name + ".npy"), mmap_mode="r")
+
+
+def build_snapshot(path, directory):
+    autos = read_autos(path)
+
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+
+    np.save(os.path.join(directory, "index.npy"), autos.index.to_numpy())
+    columns = [write_column(directory, name, autos[name]) for name in autos.columns]
+    hashes = pd.Series(listing_hashes(autos), index=autos.index)
+    columns.append(write_column(directory, HASH_COLUMN, hashes))
+
+    # meta.json is written last, so an interrupted build is never taken for a valid snapshot.
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "rules": json.loads(json.dumps(cleaning_rules())),
+        "dedup_columns": DEDUP_COLUMNS,
+        "rows": len(autos),
+        "columns": columns,
+        "outlier_thresholds": autos.attrs.get("outlier_thresholds"),
+        "hash": file_hash(path),
+    }
+    meta.update(source_info(path))
+    write_meta(directory, meta)
+    return meta
+
+
+# Only the given columns are read; leaving out "name" avoids decoding the listing titles, which is the only part of
+# the load that takes time in proportion to the number of listings. Without columns, all columns but HASH_COLUMN are
+# read.
+def open_snapshot(directory, meta, columns=None):
+    entries = meta["columns"]
+    if columns is None:
+        entries = [entry for entry in entries if entry["name"] != HASH_COLUMN]
+    else:
+        entries = [entry for entry in entries if entry["name"] in columns]
+    index = np.load(os.path.join(directory, "index.npy"), mmap_mode="r")
+    autos = pd.DataFrame(
+        {entry["name"]: read_column(directory, entry) for entry in entries},
+        index=pd.Index(index),
+        copy=False,
+    )
+    autos.attrs["outlier_thresholds"] = meta["outlier_thresholds"]
+    return autos
+
+
+# Returns the cleaned autos frame and whether the snapshot had to be (re)built.
+def load_autos(path, columns=None, rebuild=False):
+    directory = snapshot_dir(path)
+    meta = None if rebuild else read_meta(directory)
+    if snapshot_is_valid(path, directory, meta):
+        return open_snapshot(directory, meta, columns), False
+    meta = build_snapshot(path, directory)
+    return open_snapshot(directory, meta, columns), True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load the cleaned eBay autos data from a columnar snapshot"
+    )
+    parser.add_argument(
+        "path",
+        nargs="?",
+        default=os.path.join(os.path.dirname(os.path.realpath(__file__)), "autos.csv"),
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="build the snapshot even if it is up to date",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    autos, built = load_autos(args.path, rebuild=args.rebuild)
+    load_time = time.perf_counter() - start
+    print(
+        "Loaded {n} listings in {t:.3f} s ({kind} load)".format(
+            n=len(autos), t=load_time, kind="cold" if built else "warm"
+        )
+    )
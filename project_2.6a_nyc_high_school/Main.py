@@ -4,12 +4,21 @@
 
 import pandas as pd
 import numpy
-import re
 import os
 import matplotlib.pyplot as plt
 import folium
 import branca.colormap as cm
 
+import loading
+import cleaning
+import combine
+import correlation
+from loading import load_data, data_files, SCHOOLS_DIR, SURVEY_FIELDS
+from cleaning import pad_codes, build_dbn, extract_coordinates
+from combine import join_tables
+from correlation import correlate
+from stages import run_stage
+
 %matplotlib inline
 
 pd.set_option('display.max_rows', 500)
@@ -19,143 +28,85 @@ def get_path(path):
     dir_path = os.path.dirname(os.path.realpath(__file__))
     return os.path.join(dir_path, path)
 
-data_files = [
-    "ap_2010.csv",
-    "class_size.csv",
-    "demographics.csv",
-    "graduation.csv",
-    "hs_directory.csv",
-    "sat_results.csv"
-]
-
-data = {}
+# All files are read at the same time, with a dtype for the columns that are compared or joined on and only the kept columns of the survey (see loading.py).
+# Every stage (load, clean, class_size, combine, correlations) keeps its result on disk (see stages.py): running a cell again reads it back, unless the data or the code of the stage changed.
 
-for f in data_files:
-    d = pd.read_csv(get_path("schools/{0}".format(f)))
-    data[f.replace(".csv", "")] = d
+data = run_stage("load", load_data, SCHOOLS_DIR, files=data_files(), code=[loading])
+survey_fields = list(SURVEY_FIELDS)
 
 # %%
 
-all_survey = pd.read_csv("schools/survey_all.txt", delimiter="\t", encoding='windows-1252')
-d75_survey = pd.read_csv("schools/survey_d75.txt", delimiter="\t", encoding='windows-1252')
-survey = pd.concat([all_survey, d75_survey], axis=0)
-
-survey["DBN"] = survey["dbn"]
-
-survey_fields = [
-    "DBN", 
-    "rr_s", 
-    "rr_t", 
-    "rr_p", 
-    "N_s", 
-    "N_t", 
-    "N_p", 
-    "saf_p_11", 
-    "com_p_11", 
-    "eng_p_11", 
-    "aca_p_11", 
-    "saf_t_11", 
-    "com_t_11", 
-    "eng_t_11", 
-    "aca_t_11", 
-    "saf_s_11", 
-    "com_s_11", 
-    "eng_s_11", 
-    "aca_s_11", 
-    "saf_tot_11", 
-    "com_tot_11", 
-    "eng_tot_11", 
-    "aca_tot_11",
-]
-survey = survey.loc[:,survey_fields]
-data["survey"] = survey
+def clean_data(data):
+    data["hs_directory"]["DBN"] = data["hs_directory"]["dbn"]
 
-# %%
+    data["class_size"]["padded_csd"] = pad_codes(data["class_size"]["CSD"])
+    data["class_size"]["DBN"] = build_dbn(data["class_size"]["CSD"], data["class_size"]["SCHOOL CODE"])
 
-data["hs_directory"]["DBN"] = data["hs_directory"]["dbn"]
+    cols = ['SAT Math Avg. Score', 'SAT Critical Reading Avg. Score', 'SAT Writing Avg. Score']
+    for c in cols:
+        data["sat_results"][c] = pd.to_numeric(data["sat_results"][c], errors="coerce")
 
-def pad_csd(num):
-    string_representation = str(num)
-    if len(string_representation) > 1:
-        return string_representation
-    else:
-        return "0" + string_representation
-    
-data["class_size"]["padded_csd"] = data["class_size"]["CSD"].apply(pad_csd)
-data["class_size"]["DBN"] = data["class_size"]["padded_csd"] + data["class_size"]["SCHOOL CODE"]
+    data['sat_results']['sat_score'] = data['sat_results'][cols[0]] + data['sat_results'][cols[1]] + data['sat_results'][cols[2]]
 
-# %%
+    # One pass of a compiled regex over the addresses gives both coordinates as floats (see cleaning.py).
 
-cols = ['SAT Math Avg. Score', 'SAT Critical Reading Avg. Score', 'SAT Writing Avg. Score']
-for c in cols:
-    data["sat_results"][c] = pd.to_numeric(data["sat_results"][c], errors="coerce")
+    coordinates = extract_coordinates(data["hs_directory"]["Location 1"])
+    data["hs_directory"]["lat"] = coordinates["lat"]
+    data["hs_directory"]["lon"] = coordinates["lon"]
 
-data['sat_results']['sat_score'] = data['sat_results'][cols[0]] + data['sat_results'][cols[1]] + data['sat_results'][cols[2]]
+    data["demographics"] = data["demographics"][data["demographics"]["schoolyear"] == 20112012]
 
-def find_lat(loc):
-    coords = re.findall("\(.+, .+\)", loc)
-    lat = coords[0].split(",")[0].replace("(", "")
-    return lat
+    data["graduation"] = data["graduation"][data["graduation"]["Cohort"] == "2006"]
+    data["graduation"] = data["graduation"][data["graduation"]["Demographic"] == "Total Cohort"]
 
-def find_lon(loc):
-    coords = re.findall("\(.+, .+\)", loc)
-    lon = coords[0].split(",")[1].replace(")", "").strip()
-    return lon
+    cols = ['AP Test Takers ', 'Total Exams Taken', 'Number of Exams with scores 3 4 or 5']
 
-data["hs_directory"]["lat"] = data["hs_directory"]["Location 1"].apply(find_lat)
-data["hs_directory"]["lon"] = data["hs_directory"]["Location 1"].apply(find_lon)
+    for col in cols:
+        data["ap_2010"][col] = pd.to_numeric(data["ap_2010"][col], errors="coerce")
+    return data
 
-data["hs_directory"]["lat"] = pd.to_numeric(data["hs_directory"]["lat"], errors="coerce")
-data["hs_directory"]["lon"] = pd.to_numeric(data["hs_directory"]["lon"], errors="coerce")
+data = run_stage("clean", clean_data, data, code=[cleaning])
 
 # %%
 
-class_size = data["class_size"]
-class_size = class_size[class_size["GRADE "] == "09-12"]
-class_size = class_size[class_size["PROGRAM TYPE"] == "GEN ED"]
-
-class_size = class_size.groupby("DBN").agg(numpy.mean)
-class_size.reset_index(inplace=True)
-data["class_size"] = class_size
-
-data["demographics"] = data["demographics"][data["demographics"]["schoolyear"] == 20112012]
-
-data["graduation"] = data["graduation"][data["graduation"]["Cohort"] == "2006"]
-data["graduation"] = data["graduation"][data["graduation"]["Demographic"] == "Total Cohort"]
+def aggregate_class_size(class_size):
+    class_size = class_size[class_size["GRADE "] == "09-12"]
+    class_size = class_size[class_size["PROGRAM TYPE"] == "GEN ED"]
 
-# %%
-
-cols = ['AP Test Takers ', 'Total Exams Taken', 'Number of Exams with scores 3 4 or 5']
+    class_size = class_size.groupby("DBN").agg(numpy.mean)
+    class_size.reset_index(inplace=True)
+    return class_size
 
-for col in cols:
-    data["ap_2010"][col] = pd.to_numeric(data["ap_2010"][col], errors="coerce")
+class_size = run_stage("class_size", aggregate_class_size, data["class_size"])
 
 # %%
-    
-combined = data["sat_results"]
 
-combined = combined.merge(data["ap_2010"], on="DBN", how="left")
-combined = combined.merge(data["graduation"], on="DBN", how="left")
+def get_first_two_chars(dbn):
+    return dbn[0:2]
 
-to_merge = ["class_size", "demographics", "survey", "hs_directory"]
+def combine_data(data, class_size):
+    data = dict(data, class_size=class_size)
+    tables = [("ap_2010", data["ap_2010"], "left"), ("graduation", data["graduation"], "left")]
 
-for m in to_merge:
-    combined = combined.merge(data[m], on="DBN", how="inner")
+    to_merge = ["class_size", "demographics", "survey", "hs_directory"]
 
-combined = combined.fillna(combined.mean())
-combined = combined.fillna(0)
+    tables += [(m, data[m], "inner") for m in to_merge]
+    combined, join_report = join_tables(data["sat_results"], tables)
 
-# %%
+    # Keep the unfilled frame: the correlations use the rows where both columns are present.
+    unfilled = combined
+    combined = combined.fillna(combined.mean())
+    combined = combined.fillna(0)
 
-def get_first_two_chars(dbn):
-    return dbn[0:2]
+    combined["school_dist"] = combined["DBN"].apply(get_first_two_chars)
+    return combined, unfilled, join_report
 
-combined["school_dist"] = combined["DBN"].apply(get_first_two_chars)
+combined, unfilled, join_report = run_stage("combine", combine_data, data, class_size, code=[get_first_two_chars, combine])
+print(join_report)
 
 # %%
 
-correlations = combined.corr()
-correlations = correlations["sat_score"]
+correlations = run_stage("correlations", correlate, unfilled, "sat_score", code=[correlation])["r"]
 print(correlations)
 
 # %%
@@ -0,0 +1,44 @@
+# Column-wise versions of the per-row helpers in Main.py, for the citywide data sets with many more rows: the DBN
+# (district-borough-number) of a school from its district and school code, and the coordinates in a "Location 1"
+# address. Both work on whole Series at once instead of calling a Python function for every row.
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# "... NY 10002\n(40.71256, -73.98467)": the coordinates in parentheses at the end of the address.
+COORDINATES = re.compile(r"\((?P<lat>[^,()]+),\s*(?P<lon>[^,()]+)\)")
+
+
+# Applies a string function to the distinct values only and spreads the result over the rows with their codes. Values
+# like districts and addresses repeat a lot in the citywide data. Missing values (code -1) get `missing`.
+def per_distinct(values, func, missing):
+    codes, uniques = pd.factorize(values)
+    results = func(pd.Series(uniques))
+    return np.append(results, [missing], axis=0)[codes]
+
+
+# Left-pads the numbers with zeros to at least `width` digits, e.g. 1 -> "01" (pad_csd in Main.py).
+def pad_codes(values, width=2):
+    padded = per_distinct(
+        values, lambda uniques: uniques.astype(str).str.zfill(width).to_numpy(), None
+    )
+    return pd.Series(padded, index=values.index, dtype="str")
+
+
+def build_dbn(districts, school_codes):
+    return pad_codes(districts) + school_codes
+
+
+# Latitude and longitude as float columns, extracted with one pass of the regex over the addresses. Addresses without
+# coordinates get NaN.
+def extract_coordinates(locations):
+    coordinates = per_distinct(
+        locations,
+        lambda uniques: uniques.str.extract(COORDINATES)
+        .apply(pd.to_numeric, errors="coerce")
+        .to_numpy(dtype=np.float64),
+        [np.nan, np.nan],
+    )
+    return pd.DataFrame(coordinates, index=locations.index, columns=["lat", "lon"])
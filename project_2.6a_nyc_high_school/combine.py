@@ -0,0 +1,104 @@
+# Joining of the school tables on DBN in one pass, instead of one merge per table. A chain of merges hashes the growing
+# result again for every table and copies all of its columns every time. Here the keys of all tables are turned into
+# integer codes once (one factorize over all of them), every table is sorted by code once, and the joins only move
+# arrays of row numbers around: for every row of the result, which row of each table it comes from. The columns are
+# copied once at the end, straight into the result.
+#
+# The result is the same as the chain of merges: rows in the order of the base table, a row for every combination of
+# matches if a key occurs more than once, and overlapping column names with the suffixes "_x" and "_y" as merge would
+# give them, one join after the other. As in merge, a missing key (NaN or None) matches the missing keys of the other
+# table: factorize gives them a code of their own. (When a key repeats on both sides of an inner join, pandas does not
+# always keep the order of the left rows that merge documents; the rows are the same, only their order differs.)
+
+import numpy as np
+import pandas as pd
+
+
+# The rows of every table sorted by key code, and per code the first of them and their number.
+def key_index(codes, n_keys):
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes, minlength=n_keys)
+    starts = np.cumsum(counts) - counts
+    return order, starts, counts
+
+
+# For every row of the result so far, its matches in the table: result rows are repeated once per match, and for a
+# left join rows without a match are kept with match -1.
+def expand(keys, index, how):
+    order, starts, counts = index
+    matches = counts[keys]
+    repeats = matches if how == "inner" else np.maximum(matches, 1)
+
+    rows = np.repeat(np.arange(len(keys)), repeats)
+    first = np.cumsum(repeats) - repeats
+    within = np.arange(len(rows)) - np.repeat(first, repeats)
+    found = np.repeat(matches, repeats) > 0
+    positions = np.where(found, np.repeat(starts[keys], repeats) + within, 0)
+    return rows, np.where(found, order[positions] if len(order) else 0, -1)
+
+
+# Joins the tables (name, frame, how) to base on the column `on`, with how "left" or "inner". Returns the joined frame
+# and a frame of row counts per table.
+def join_tables(base, tables, on="DBN"):
+    frames = [base] + [frame for _, frame, _ in tables]
+    codes, uniques = pd.factorize(
+        pd.concat([frame[on] for frame in frames]), use_na_sentinel=False
+    )
+    bounds = np.cumsum([0] + [len(frame) for frame in frames])
+    frame_codes = [codes[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+    # rows[i] are the rows of frames[i] that make up the result, -1 where a left join found nothing.
+    rows = [np.arange(len(base))]
+    filled = [False]
+    report = []
+    for i, (name, frame, how) in enumerate(tables, start=1):
+        table_codes = frame_codes[i]
+        keys = frame_codes[0][rows[0]]
+        before = len(keys)
+        picked, matches = expand(keys, key_index(table_codes, len(uniques)), how)
+        rows = [r[picked] for r in rows] + [matches]
+        filled.append(bool((matches < 0).any()))
+
+        distinct = np.unique(table_codes)
+        report.append(
+            {
+                "source": name,
+                "how": how,
+                "rows": len(frame),
+                "keys": len(distinct),
+                "duplicate_rows": len(table_codes) - len(distinct),
+                "rows_before": before,
+                "unmatched": int(np.isin(keys, distinct, invert=True).sum()),
+                "rows_after": len(picked),
+            }
+        )
+
+    # Column names as a chain of merges would give them.
+    columns = [(column, 0, column) for column in base.columns]
+    for i, (_, frame, _) in enumerate(tables, start=1):
+        names = {name for name, _, _ in columns}
+        overlap = names & set(frame.columns) - {on}
+        columns = [
+            (name + "_x" if name in overlap else name, source, column)
+            for name, source, column in columns
+        ]
+        columns += [
+            (column + "_y" if column in overlap else column, i, column)
+            for column in frame.columns
+            if column != on
+        ]
+
+    joined = {}
+    for name, source, column in columns:
+        values = frames[source][column].array
+        if filled[source]:
+            # merge gives the columns of a left join a dtype that holds missing values (int -> float) as soon as one
+            # row is unmatched, even if a later inner join drops that row again: take one extra missing row.
+            taken = pd.api.extensions.take(
+                values, np.append(rows[source], -1), allow_fill=True
+            )
+            joined[name] = taken[:-1]
+        else:
+            joined[name] = pd.api.extensions.take(values, rows[source], allow_fill=True)
+    combined = pd.DataFrame(joined, copy=False)
+    return combined, pd.DataFrame(report).set_index("source")
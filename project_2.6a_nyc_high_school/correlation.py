@@ -0,0 +1,200 @@
+# Correlations of a few target columns (e.g. "sat_score") with every numeric column, instead of the full matrix of
+# combined.corr() of which only one column is used. Missing values are handled pairwise, as DataFrame.corr does: every
+# pair of columns uses the rows where both are present, so the correlations can be taken before the missing values are
+# filled in with the column means (which pulls them towards 0).
+#
+# The columns are processed in blocks of BLOCK_COLUMNS. For a block, the sums that make up the correlations (counts,
+# sums, sums of squares and of products over the rows present in both columns) are matrix products of the targets and
+# their masks with the block and its mask, so the work grows with rows * columns * targets. The columns are converted to
+# floats (and resampled, for the bootstrap) one block at a time, so the memory grows with rows * block size, however
+# wide the frame is.
+#
+# Optionally with two-sided p-values (t-test of r = 0 with n - 2 degrees of freedom) and percentile bootstrap
+# confidence intervals. The bootstrap samples are computed in a thread pool (numpy releases the GIL in the matrix
+# products), and every sample draws its rows from its own seed, so the intervals do not depend on the number of
+# workers.
+
+import math
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BLOCK_COLUMNS = 256
+CONFIDENCE = 0.95
+MAX_ITERATIONS = 200
+EPSILON = 1e-12
+TINY = 1e-300
+
+
+def numeric_columns(frame):
+    return list(frame.select_dtypes(include=["number", "bool"]).columns)
+
+
+def float_values(frame, columns):
+    return frame[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+# The values as float columns with the missing values set to 0 (after centring on the column means, which keeps the
+# sums of squares small), and the mask of the values that are present.
+def centred(values):
+    values = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(values)
+    counts = present.sum(axis=0)
+    sums = np.where(present, values, 0).sum(axis=0)
+    means = np.divide(sums, counts, out=np.zeros(len(counts)), where=counts > 0)
+    return np.where(present, values - means, 0), present.astype(np.float64)
+
+
+# Pearson correlations and pair counts of every target with every column of the block, both of shape (targets, block).
+def block_correlations(targets, target_present, block, block_present):
+    n = target_present.T @ block_present
+    sum_x = target_present.T @ block
+    sum_y = targets.T @ block_present
+    sum_xx = target_present.T @ block**2
+    sum_yy = (targets**2).T @ block_present
+    sum_xy = targets.T @ block
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = sum_xy - sum_x * sum_y / n
+        variance_x = sum_xx - sum_x**2 / n
+        variance_y = sum_yy - sum_y**2 / n
+        r = covariance / np.sqrt(variance_x * variance_y)
+    r = np.where((n > 1) & (variance_x > 0) & (variance_y > 0), r, np.nan)
+    return np.clip(r, -1, 1), n
+
+
+# Correlations of the target values with the columns of the frame, for the given rows of both (all rows if None).
+def correlation_matrix(targets, frame, columns, rows=None, block_columns=BLOCK_COLUMNS):
+    if rows is not None:
+        targets = targets[rows]
+    target_values, target_present = centred(targets)
+    r = np.empty((targets.shape[1], len(columns)))
+    n = np.empty(r.shape)
+    for start in range(0, len(columns), block_columns):
+        block = slice(start, start + block_columns)
+        values = float_values(frame, columns[block])
+        if rows is not None:
+            values = values[rows]
+        r[:, block], n[:, block] = block_correlations(
+            target_values, target_present, *centred(values)
+        )
+    return r, n
+
+
+# Continued fraction of the regularized incomplete beta function (modified Lentz's method), elementwise.
+def beta_fraction(a, b, x):
+    def bounded(values):
+        return np.where(np.abs(values) < TINY, TINY, values)
+
+    c = np.ones_like(x)
+    d = 1 / bounded(1 - (a + b) * x / (a + 1))
+    fraction = d
+    for m in range(1, MAX_ITERATIONS + 1):
+        step = m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m))
+        d = 1 / bounded(1 + step * d)
+        c = bounded(1 + step / c)
+        fraction = fraction * d * c
+        step = -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))
+        d = 1 / bounded(1 + step * d)
+        c = bounded(1 + step / c)
+        fraction = fraction * d * c
+        if not np.any(np.abs(d * c - 1) > EPSILON):
+            break
+    return fraction
+
+
+def incomplete_beta(a, b, x):
+    a, b, x = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (a, b, x)))
+    # The continued fraction converges quickly for x below (a + 1) / (a + b + 2); above, use I_x(a, b) = 1 - I_1-x(b, a).
+    flip = x > (a + 1) / (a + b + 2)
+    a, b, x = np.where(flip, b, a), np.where(flip, a, b), np.where(flip, 1 - x, x)
+    lgamma = np.vectorize(math.lgamma, otypes=[np.float64])
+    with np.errstate(divide="ignore"):
+        front = np.exp(
+            lgamma(a + b) - lgamma(a) - lgamma(b) + a * np.log(x) + b * np.log1p(-x)
+        )
+    value = front * beta_fraction(a, b, x) / a
+    return np.where(flip, 1 - value, value)
+
+
+# P(|T| >= |t|) for t = r * sqrt((n - 2) / (1 - r^2)), which is I_(1 - r^2)((n - 2) / 2, 1 / 2).
+def correlation_p_values(r, n):
+    valid = ~np.isnan(r) & (n > 2)
+    degrees = np.where(valid, n - 2, 1)
+    x = np.where(valid, 1 - r**2, 1)
+    return np.where(valid, incomplete_beta(degrees / 2, 0.5, x), np.nan)
+
+
+# Percentile intervals of the correlations over `samples` bootstrap samples of the rows.
+def bootstrap_intervals(
+    targets,
+    frame,
+    columns,
+    samples,
+    confidence=CONFIDENCE,
+    seed=0,
+    workers=None,
+    block_columns=BLOCK_COLUMNS,
+):
+    seeds = np.random.SeedSequence(seed).spawn(samples)
+
+    def sample(seed_sequence):
+        rows = np.random.default_rng(seed_sequence).integers(
+            0, len(targets), len(targets)
+        )
+        return correlation_matrix(targets, frame, columns, rows, block_columns)[0]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        r = np.stack(list(pool.map(sample, seeds)))
+    tail = (1 - confidence) / 2
+    # Columns without any pairs give all-NaN samples and NaN intervals.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        low, high = np.nanquantile(r, [tail, 1 - tail], axis=0)
+    return low, high
+
+
+# Correlations of the target column(s) with every numeric column of the frame (the targets included), as a frame with
+# the columns "r" and "n" (the number of rows present in both), "p" if p_values, and "ci_low" and "ci_high" if
+# bootstrap is a number of samples. Indexed by column for a single target name, by (target, column) for a list.
+def correlate(
+    frame,
+    targets,
+    columns=None,
+    p_values=False,
+    bootstrap=0,
+    confidence=CONFIDENCE,
+    seed=0,
+    workers=None,
+    block_columns=BLOCK_COLUMNS,
+):
+    single = isinstance(targets, str)
+    target_names = [targets] if single else list(targets)
+    columns = numeric_columns(frame) if columns is None else list(columns)
+
+    target_values = float_values(frame, target_names)
+    r, n = correlation_matrix(target_values, frame, columns, None, block_columns)
+
+    result = {"r": r.ravel(), "n": n.ravel().astype(np.int64)}
+    if p_values:
+        result["p"] = correlation_p_values(r, n).ravel()
+    if bootstrap:
+        low, high = bootstrap_intervals(
+            target_values,
+            frame,
+            columns,
+            bootstrap,
+            confidence,
+            seed,
+            workers,
+            block_columns,
+        )
+        result["ci_low"], result["ci_high"] = low.ravel(), high.ravel()
+
+    index = pd.MultiIndex.from_product(
+        [target_names, columns], names=["target", "column"]
+    )
+    result = pd.DataFrame(result, index=index)
+    return result.loc[targets] if single else result
@@ -0,0 +1,111 @@
+# Loading of the NYC schools data. The files are read at the same time in a thread pool (the CSV parser of pandas
+# releases the GIL while it tokenizes), so loading takes about as long as the largest file instead of the sum of all
+# of them. Every file has its own read_csv arguments: the columns that are compared or joined on get an explicit dtype,
+# so e.g. "Cohort" stays a string whatever the first rows look like, and of the survey only the columns that are kept
+# are read.
+#
+# load_data returns the same dict as the loop in Main.py did: one DataFrame per CSV file, named after the file, and
+# "survey" with the survey fields of both survey files.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+SCHOOLS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "schools")
+
+SURVEY_FIELDS = [
+    "DBN",
+    "rr_s",
+    "rr_t",
+    "rr_p",
+    "N_s",
+    "N_t",
+    "N_p",
+    "saf_p_11",
+    "com_p_11",
+    "eng_p_11",
+    "aca_p_11",
+    "saf_t_11",
+    "com_t_11",
+    "eng_t_11",
+    "aca_t_11",
+    "saf_s_11",
+    "com_s_11",
+    "eng_s_11",
+    "aca_s_11",
+    "saf_tot_11",
+    "com_tot_11",
+    "eng_tot_11",
+    "aca_tot_11",
+]
+
+SAT_COLUMNS = [
+    "SAT Math Avg. Score",
+    "SAT Critical Reading Avg. Score",
+    "SAT Writing Avg. Score",
+]
+
+# The survey files name the DBN column "dbn"; "DBN" is added after reading.
+SURVEY_FILE = {
+    "sep": "\t",
+    "encoding": "windows-1252",
+    "usecols": ["dbn"] + SURVEY_FIELDS[1:],
+    "dtype": {"dbn": str},
+}
+
+FILES = {
+    "ap_2010": dict(filename="ap_2010.csv", dtype={"DBN": str}),
+    "class_size": dict(
+        filename="class_size.csv",
+        dtype={"CSD": "int64", "SCHOOL CODE": str, "GRADE ": str, "PROGRAM TYPE": str},
+    ),
+    "demographics": dict(
+        filename="demographics.csv", dtype={"DBN": str, "schoolyear": "int64"}
+    ),
+    "graduation": dict(
+        filename="graduation.csv",
+        dtype={"DBN": str, "Cohort": str, "Demographic": str},
+    ),
+    "hs_directory": dict(
+        filename="hs_directory.csv", dtype={"dbn": str, "Location 1": str}
+    ),
+    "sat_results": dict(
+        filename="sat_results.csv", dtype=dict.fromkeys(["DBN"] + SAT_COLUMNS, str)
+    ),
+    "survey_all": dict(SURVEY_FILE, filename="survey_all.txt"),
+    "survey_d75": dict(SURVEY_FILE, filename="survey_d75.txt"),
+}
+CSV_NAMES = [
+    "ap_2010",
+    "class_size",
+    "demographics",
+    "graduation",
+    "hs_directory",
+    "sat_results",
+]
+SURVEY_NAMES = ["survey_all", "survey_d75"]
+
+
+def read_file(directory, name):
+    options = dict(FILES[name])
+    path = os.path.join(directory, options.pop("filename"))
+    return pd.read_csv(path, **options)
+
+
+def data_files(directory=SCHOOLS_DIR):
+    return [os.path.join(directory, FILES[name]["filename"]) for name in FILES]
+
+
+def load_data(directory=SCHOOLS_DIR, workers=None):
+    names = CSV_NAMES + SURVEY_NAMES
+    with ThreadPoolExecutor(max_workers=workers or len(names)) as pool:
+        frames = dict(
+            zip(names, pool.map(lambda name: read_file(directory, name), names))
+        )
+
+    data = {name: frames[name] for name in CSV_NAMES}
+    survey = pd.concat([frames[name] for name in SURVEY_NAMES], axis=0)
+    survey["DBN"] = survey["dbn"]
+    data["survey"] = survey.loc[:, SURVEY_FIELDS]
+    return data
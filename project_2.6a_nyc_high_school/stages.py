@@ -0,0 +1,160 @@
+# Disk cache for the stages of Main.py (load, clean, class_size, combine, correlations), so changing a plot does not
+# mean reading the CSV files, cleaning and joining them again. A stage is a function; run_stage calls it and pickles
+# its result to a file in CACHE_DIR, or reads that file back if the stage has run before with the same inputs and code.
+#
+# The file is named after the stage and a key, the SHA-256 hash of:
+#   - the content of its arguments: DataFrames and Series by their values (pd.util.hash_pandas_object), index, column
+#     names and dtypes; dicts, lists and tuples by their items; anything else by its pickle;
+#   - the content of the data files it reads (the files argument). As in the caches of the other projects, the hash of
+#     every file is kept with its size and mtime in files.json, and only computed again when those differ;
+#   - the source code of the stage function and of the functions and modules it uses (the code argument).
+# The result of a stage is the input of the next one, so a change anywhere recomputes the stages from there on and
+# reads the ones before it from the cache.
+#
+# The stage gets copies of its arguments, so cells that change their data in place still leave the inputs (and their
+# hashes) as they were.
+
+import os
+import copy
+import json
+import pickle
+import hashlib
+import inspect
+
+import numpy as np
+import pandas as pd
+
+STAGES_VERSION = 1
+CACHE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), ".stages")
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 24), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_info(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def read_meta(directory):
+    meta_path = os.path.join(directory, "files.json")
+    if not os.path.exists(meta_path):
+        return {}
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_meta(directory, meta):
+    with open(os.path.join(directory, "files.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+# The hashes of the files, computed again only for files whose size or mtime changed.
+def files_hash(paths, directory=CACHE_DIR):
+    meta = read_meta(directory)
+    digest = hashlib.sha256()
+    changed = False
+    for path in sorted(os.path.realpath(path) for path in paths):
+        info = source_info(path)
+        known = meta.get(path)
+        if (
+            known is None
+            or known["size"] != info["size"]
+            or known["mtime"] != info["mtime"]
+        ):
+            meta[path] = dict(info, hash=file_hash(path))
+            changed = True
+        digest.update(path.encode("utf-8"))
+        digest.update(meta[path]["hash"].encode("ascii"))
+    if changed:
+        write_meta(directory, meta)
+    return digest.hexdigest()
+
+
+def update_hash(digest, value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(type(value).__name__.encode("ascii"))
+        frame = value.to_frame() if isinstance(value, pd.Series) else value
+        digest.update(
+            pickle.dumps([list(frame.columns), frame.dtypes.astype(str).tolist()])
+        )
+        try:
+            hashes = pd.util.hash_pandas_object(value, index=True).to_numpy()
+        except TypeError:
+            # Values that cannot be hashed column-wise (e.g. lists in a cell) are hashed by their pickle.
+            hashes = pickle.dumps(value)
+        digest.update(hashes)
+    elif isinstance(value, np.ndarray):
+        digest.update(pickle.dumps([value.dtype.str, value.shape]))
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        digest.update(b"dict%d" % len(value))
+        for key in sorted(value, key=repr):
+            update_hash(digest, key)
+            update_hash(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"%s%d" % (type(value).__name__.encode("ascii"), len(value)))
+        for item in value:
+            update_hash(digest, item)
+    else:
+        digest.update(pickle.dumps(value))
+
+
+def content_hash(value):
+    digest = hashlib.sha256()
+    update_hash(digest, value)
+    return digest.hexdigest()
+
+
+# The source of a function or module, or the compiled code of functions whose source is not available.
+def code_hash(objects):
+    digest = hashlib.sha256()
+    for obj in objects:
+        try:
+            digest.update(inspect.getsource(obj).encode("utf-8"))
+        except (OSError, TypeError):
+            code = obj.__code__
+            digest.update(code.co_code)
+            digest.update(repr(code.co_consts).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def stage_key(name, func, args, files=(), code=(), directory=CACHE_DIR):
+    digest = hashlib.sha256()
+    for part in [
+        str(STAGES_VERSION),
+        name,
+        content_hash(args),
+        files_hash(files, directory) if files else "",
+        code_hash([func] + list(code)),
+    ]:
+        digest.update(part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def stage_path(name, key, directory=CACHE_DIR):
+    return os.path.join(directory, "{}-{}.pkl".format(name, key[:16]))
+
+
+# Returns func(*args), from the cache if the stage has run with the same arguments, files and code before. Only the
+# latest result of every stage is kept.
+def run_stage(name, func, *args, files=(), code=(), directory=CACHE_DIR, rebuild=False):
+    os.makedirs(directory, exist_ok=True)
+    key = stage_key(name, func, args, files, code, directory)
+    path = stage_path(name, key, directory)
+    if not rebuild and os.path.exists(path):
+        return pd.read_pickle(path)
+
+    result = func(*copy.deepcopy(args))
+    for entry in os.listdir(directory):
+        if entry.startswith(name + "-") and entry.endswith(".pkl"):
+            os.remove(os.path.join(directory, entry))
+    # Written under another name first, so an interrupted run leaves no broken file behind.
+    pd.to_pickle(result, path + ".tmp", compression=None)
+    os.replace(path + ".tmp", path)
+    return result